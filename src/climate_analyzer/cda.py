@@ -16,23 +16,26 @@ import re
 import os
 import sys
 import copy
+import atexit
 import logging
+import functools
 import numpy as np
 from configparser import RawConfigParser
 
 from glob import glob
 from datetime import date, datetime, timedelta
 from itertools import groupby, accumulate
+from concurrent.futures import ThreadPoolExecutor
 
 from climate_analyzer.__init__ import __version__
-from climate_analyzer.noaa import NOAA
+from climate_analyzer.noaa import NOAA, MAX_DOWNLOADS
 from climate_analyzer.gui_main import guiMain
-from climate_analyzer.gui_plot import dayInt2MMDD, dayInt2Label, date2enum
 from climate_analyzer.db_coupler import dbCoupler, DBTYPE_CDO
-from climate_analyzer.climate_dataobj import ClimateDataObj 
+from climate_analyzer.climate_dataobj import ClimateDataObj, dayInt2MMDD, dayInt2Label, date2enum
 
 dbName = os.path.join('extra', 'fips_codes.db')
 user_dbPath = 'AppData\\ClimateData'
+_fips_dbMgr = None        # see get_fips_db()
 
 def QueryStdIO(prompt, intype=str):
     inp = None
@@ -55,30 +58,27 @@ def print_stations(station_list):
     """
     print(f'{"stations_id":^15} {"dist2home":^10} {"elev":^6} {"1st Date":^10} {"last Date"}')
     for _s in station_list:
-        sid = _s.id.split(':')
-        if sid[0].upper() != 'GHCND':
+        if _s.id[:6].upper() != 'GHCND:':
             continue
 
         elev = f'{_s.elev:>4.0f}'
         print(f'{_s.id:17} {_s.dist2home:>4.1f}mi {elev:>6}ft {_s.mindate.date()} {_s.maxdate.date()} {_s.name[:40]}')
 
-def find_fipcode(state, locale=None):
-    dbfName = os.path.join(os.path.dirname(__file__), dbName)
-
-    dbMgr = dbCoupler()
-    dbMgr.open(dbfName)
-    fipList = dbMgr.find_rgn_by_state_and_locale(state, locale)
-    dbMgr.close()
+def get_fips_db() -> dbCoupler:
+    """ dbCoupler for the fips_codes.db, opened on 1st use & kept open (read only) until exit
+    """
+    global _fips_dbMgr
+    if _fips_dbMgr is None:
+        _fips_dbMgr = dbCoupler()
+        _fips_dbMgr.open(os.path.join(os.path.dirname(__file__), dbName), readonly=True)
+        atexit.register(_fips_dbMgr.close)
+    return _fips_dbMgr
 
-    return fipList
+def find_fipcode(state, locale=None):
+    return get_fips_db().find_rgn_by_state_and_locale(state, locale)
 
 def find_region_bycode(code):
-    dbfName = os.path.join(os.path.dirname(__file__), dbName)
-
-    dbMgr = dbCoupler()
-    dbMgr.open(dbfName)
-    fipList = dbMgr.find_rgn_by_code(code)
-    dbMgr.close()
+    fipList = get_fips_db().find_rgn_by_code(code)
 
     region = fipList.pop()
     if fipList:
@@ -99,12 +99,15 @@ def store_to_db(noaaObj: NOAA, dbPath: str, noaa_id, station_name):
         return
 
     dbMgr = dbCoupler()
-    dbMgr.open(dbfName)
-    for _yr in range(noaa_info.mindate.year, date.today().year + 1):
-        start_date = date(_yr, 1, 1)
-        cdList = noaaObj.get_dataset_v1(noaa_id, start_date)
-        print(_yr, len(cdList))
-        dbMgr.wr_cdtable(str(_yr), cdList)
+    dbMgr.open(dbfName, wal=True)
+
+    # Years are downloaded concurrently but written to the DB in order
+    yrList = range(noaa_info.mindate.year, date.today().year + 1)
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS) as executor:
+        for _yr, cdList in zip(yrList, executor.map(
+                lambda _y: noaaObj.get_dataset_v1(noaa_id, date(_y, 1, 1)), yrList)):
+            print(_yr, len(cdList))
+            dbMgr.wr_cdtable(str(_yr), cdList)
 
     dbMgr.close()
 
@@ -171,8 +174,10 @@ def opt_findrgn(findrgn, appCfg, noaaObj):
             except IndexError:
                 print('  Invalid, Requires Integer 0:{}'.format(len(fipItems)))
                 continue
-            appCfg['NOAA']['findrgn'] = f'{rgnInfo.code:05d}'
-            appCfg_update = True
+            new_findrgn = f'{rgnInfo.code:05d}'
+            if appCfg['NOAA']['findrgn'] != new_findrgn:    # only save ini file if changed
+                appCfg['NOAA']['findrgn'] = new_findrgn
+                appCfg_update = True
             # rgnInfo = item
             # save_appCfg(appCfg, iniPath)
             # print(f'  {item.state}, {item.region} {item.qualifier} = {appCfg["NOAA"]["findrgn"]}')
@@ -192,8 +197,9 @@ def opt_home(home, appCfg, noaaObj):
         try:
             new_home = [float(x) for x in lat_long]
             new_cfg = '(' + ','.join(['{:.5f}'.format(x) for x in new_home]) + ')'
-            appCfg['NOAA']['home'] = new_cfg
-            appCfg_update = True
+            if appCfg['NOAA']['home'] != new_cfg:           # only save ini file if changed
+                appCfg['NOAA']['home'] = new_cfg
+                appCfg_update = True
             # save_appCfg(appCfg, iniPath)
 
         except Exception as err:
@@ -212,10 +218,14 @@ def opt_station(station, appCfg, noaaObj):
         print('{:^20}{:^20}{:^18}{:^14}{:^10}'.format(
             'alias', 'station_id', 'lat_long', 'dist2home', 'elev'))
 
-        for _alias, _sid in appCfg['Stations'].items():
+        # station_info requests are made concurrently, results are printed in config order
+        stations = list(appCfg['Stations'].items())
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS) as executor:
+            infoList = list(executor.map(noaaObj.station_info, [_sid for _alias, _sid in stations]))
+
+        for (_alias, _sid), (err, metaData) in zip(stations, infoList):
             cfgInfo = f'{_alias:20}: {_sid}'
 
-            err, metaData = noaaObj.station_info(_sid)
             if err:
                 infoStr = str(err)
             else:
@@ -289,8 +299,9 @@ def main():
 
         if args.token:
             if args.arg1:
-                appCfg['NOAA']['cdo_token'] = args.arg1
-                save_appCfg(appCfg, iniPath)
+                if appCfg['NOAA']['cdo_token'] != args.arg1:   # only save ini file if changed
+                    appCfg['NOAA']['cdo_token'] = args.arg1
+                    save_appCfg(appCfg, iniPath)
             else:
                 print(f"  cdo_token = {appCfg['NOAA']['cdo_token']}")
             return
@@ -301,12 +312,15 @@ def main():
             print('See: https://www.ncdc.noaa.gov/cdo-web/token')
             return
 
-        noaaObj = NOAA(dict(appCfg['NOAA']))     # NOAA Obj provided with dict from ini file
-        station_dict = dict(appCfg['Stations'])  # ini file provides dict of alias:station_id
+        @functools.cache
+        def get_noaaObj():
+            """ NOAA Obj provided with dict from ini file, only created if a branch needs it
+            """
+            return NOAA(dict(appCfg['NOAA']))
 
         if args.find:
             dist2home = float(args.arg1) if args.arg1 is not None else 30.0
-            err, station_list = noaaObj.get_stations(dist2home)
+            err, station_list = get_noaaObj().get_stations(dist2home)
             if err:
                 print(err)
             else:
@@ -314,21 +328,22 @@ def main():
                 print(f'home @ {appCfg["NOAA"]["home"]}')
 
         elif args.findrgn:
-            update_cfg = opt_findrgn(args.arg1, appCfg, noaaObj)
+            update_cfg = opt_findrgn(args.arg1, appCfg, get_noaaObj())
             if update_cfg:
                 save_appCfg(appCfg, iniPath)
 
         elif args.home:
-            update_cfg = opt_home(args.arg1, appCfg, noaaObj)
+            update_cfg = opt_home(args.arg1, appCfg, get_noaaObj())
             if update_cfg:
                 save_appCfg(appCfg, iniPath)
 
         elif args.station:
-            update_cfg = opt_station(args.arg1, appCfg, noaaObj)
+            update_cfg = opt_station(args.arg1, appCfg, get_noaaObj())
             if update_cfg:
                 save_appCfg(appCfg, iniPath)
 
         elif args.getcd:
+            station_dict = dict(appCfg['Stations'])  # ini file provides dict of alias:station_id
             if args.arg1 is None:
                 station_info = '\n'.join(['    ' + x for x in station_dict.keys()])
                 parser.error('[arg1] must supply station name:\n' + station_info)
@@ -342,17 +357,27 @@ def main():
                     station_id = None
 
                 if station_id:
-                    store_to_db(noaaObj, dbDir, station_id, args.arg1)
+                    store_to_db(get_noaaObj(), dbDir, station_id, args.arg1)
                 else:
                     raise ValueError
 
         else:
             upd_yrs = range(date.today().year - int(appCfg['NOAA']['upd_yrs']), date.today().year)
             upd_yrList = [_yr + 1 for _yr in upd_yrs]
-            cdObj = ClimateDataObj(dbDir, upd_yrList, station_dict, noaaObj)
+            station_dict = dict(appCfg['Stations'])  # ini file provides dict of alias:station_id
+            cdObj = ClimateDataObj(dbDir, upd_yrList, station_dict, get_noaaObj(), defer_update=True)
 
             gui = guiMain(cdObj, (800, 100), __version__)  # Gui Setup
-            gui.mainloop()
+
+            # NOAA downloads run in a worker thread, the Gui opens with current DB data & is redrawn when done.
+            # Closing the Gui cancels the update, exit only waits for NOAA requests already in flight
+            executor = ThreadPoolExecutor(max_workers=1)
+            try:
+                gui.reload_when_done(executor.submit(cdObj.update_stations))
+                gui.mainloop()
+            finally:
+                cdObj.cancel_update()
+                executor.shutdown(wait=False, cancel_futures=True)
             
 
 if __name__ == '__main__':
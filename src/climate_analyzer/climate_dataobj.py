@@ -7,16 +7,20 @@ from datetime import date
 from glob import glob
 from enum import IntEnum
 from typing import Dict, List, Tuple, TypedDict
-from collections import namedtuple
+from operator import attrgetter
+from collections import namedtuple, OrderedDict
 from calendar import month_abbr
-from itertools import groupby, accumulate
-from .noaa import NOAA
+from concurrent.futures import ThreadPoolExecutor
+from .noaa import NOAA, MAX_DOWNLOADS
 from .db_coupler import dbCoupler, DBTYPE_CDO, CD_NODATE_NPDT
 
 import logging
 import os
+import sys
+import threading
 import warnings
 import numpy as np
+import numpy.lib.recfunctions as rfn
 
 STATION_T = namedtuple('STATION_T', ['alias', 'id'])
 PLOT_DATA = IntEnum('PLOT_DATA', ['RAIN', 'TEMP'])
@@ -33,44 +37,43 @@ mm2days = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
 mmlabels = [month_abbr[x] for x in range(1, 13)]
 PLOT_TYPE = IntEnum('PLOT_TYPE', ['ALLDOY', 'SNGLDOY', 'HISTO'])
 DATE_ENUM = namedtuple('DATE_ENUM', ['yrenum', 'dayenum'])
+ALLDOY_CACHE_SIZE = 4  # Number of alldoy_data() results kept, see ClimateDataObj.alldoy_data
+_DAY2MMDD = tuple((_mm + 1, _dd + 1) for _mm in range(12) for _dd in range(mm2days[_mm]))  # dayenum -> (mm, dd)
+_DAY2LABEL = tuple(f'{mmlabels[_mm - 1]}-{_dd:02d}' for _mm, _dd in _DAY2MMDD)                # dayenum -> 'Mon-DD'
+_MM2DAYENUM = [sum(mm2days[:_mm]) for _mm in range(12)]                                      # month - 1 -> dayenum of 1st
 
 
 def dayInt2Label(day):
-    month_int = 0
-    while day > mm2days[month_int] - 1:
-        day -= mm2days[month_int]
-        month_int += 1
-    return f'{mmlabels[month_int]}-{day + 1:02d}'
+    return _DAY2LABEL[day]
 
 
 def dayInt2MMDD(day):
-    if day > 365:
+    if day < 0 or day > 365:
         raise ValueError
-
-    month_int = 0
-    while day > mm2days[month_int] - 1:
-        day -= mm2days[month_int]
-        month_int += 1
-    return month_int + 1, day + 1
+    return _DAY2MMDD[day]
 
 
 def date2enum(dayDate: date | str):
-    dayenum = 0
     if type(dayDate) == date:
         yr, mm, dd = dayDate.year, dayDate.month, dayDate.day
     elif type(dayDate) == str:
-        yr, mm, dd = dayDate.split('-')
+        yr, mm, dd = int(dayDate[:4]), int(dayDate[5:7]), int(dayDate[8:10])   # fixed 'YYYY-MM-DD' layout
     else:
         raise ValueError
+    return _MM2DAYENUM[mm - 1] + dd - 1, int(yr)
 
-    for indx in range(12):
-        if mm == 1:
-            break
-        else:
-            mm -= 1
-            dayenum += mm2days[indx]
-    dayenum += dd - 1
-    return dayenum, int(yr)
+
+def _xy_points(x: np.ndarray, y_list: List[np.ndarray], dtype) -> np.ndarray:
+    """ Combine x with 1 or 2 y arrays (i.e. dnames) of the same length into plot points.
+        Returns M x 2 for 1 y array, M x 2 x 2 for 2 (tmin, tmax) y arrays, filled in place with no intermediates
+    """
+    if len(y_list) not in (1, 2):
+        raise ValueError
+    pts = np.empty((len(x), len(y_list), 2), dtype=dtype)
+    pts[:, :, 0] = x[:, np.newaxis]
+    for _i, _y in enumerate(y_list):
+        pts[:, _i, 1] = _y
+    return pts[:, 0] if len(y_list) == 1 else pts
 
 
 class ClimateDataObj:
@@ -124,7 +127,8 @@ class ClimateDataObj:
     def __init__(self, dbDir: str,             # Full Path to Directory Containing sqllite DBs.
                  updYrList: List[int],         # A list of years that should be checked for updates
                  stationDict: Dict[str, str],  # key = station_alias, must match sqlite DB name
-                 noaaObj: NOAA):               # Object that provides Internet access to NOAA data
+                 noaaObj: NOAA,                # Object that provides Internet access to NOAA data
+                 defer_update: bool = False):  # True: caller runs update_stations(), e.g. in a worker thread
         """ Loads Climate Data for the first NOAA Station identified in stationDict.
             This requires stationDict to be ordered!  That in turn requires Python > 3.7!
 
@@ -134,6 +138,7 @@ class ClimateDataObj:
         self._stationDict = stationDict
         self._dbMgr = dbCoupler()
         self._ma_numdays = 15  # Moving Avg Window Size
+        self._alldoy_cache = OrderedDict()  # (station, dtype, xorigin, ma_numdays) -> alldoy_data() dict, LRU order
 
         self._logger = logging.getLogger(__name__)  # Logger
         self._logger.setLevel(logging.INFO)
@@ -145,36 +150,61 @@ class ClimateDataObj:
         dbMatch = os.path.join(dbDir, '*.db')
         dbFileList = [os.path.abspath(_f) for _f in glob(dbMatch)]
 
-        self._stationList = []
+        # Reverse map of expected DB file path -> STATION_T for each configured station
+        station_by_path = {os.path.abspath(os.path.join(dbDir, _alias + '.db')): STATION_T(alias=_alias, id=_id)
+                           for _alias, _id in stationDict.items()}
+
+        self._updYrList = updYrList
+        self._download_slots = threading.BoundedSemaphore(MAX_DOWNLOADS)  # NOAA requests in flight, all stations
+        self._update_cancel = threading.Event()  # set by cancel_update(), running updates stop before writing
+        self._updStations = []  # (STATION_T, dbFilePath) of each configured station DB, see update_stations()
         if updYrList:
             # print('-------', updYrList)
 
             for _fpath in dbFileList:
-                station_alias = os.path.splitext(os.path.basename(_fpath))[0]
-                try:
-                    station = STATION_T(alias=station_alias,
-                                        id=self._stationDict[station_alias])
-
-                    self.update_db(station, _fpath, noaaObj, updYrList)
-                    self._stationList.append(station_alias)
+                station = station_by_path.get(_fpath)
+                if station is None:
+                    print(f'  {os.path.basename(_fpath)} Not a configured Station, Ignored')
+                    continue
+                self._updStations.append((station, _fpath))
 
-                except KeyError:
-                    pass
+        self._stationList = [_station.alias for _station, _fpath in self._updStations]
+        if not defer_update:
+            self.update_stations()
 
+        self._station = None
+        self._station_data = {}  # station alias -> (yrList, np_climate_data, np_fields, np_alldoy_mean), see station.setter
         for _s in stationDict.keys():
             selectDB = os.path.join(dbDir, _s + '.db')
             if selectDB in dbFileList:
-                self._station = _s
-                self._dbMgr.open(selectDB)
-                self._yrList, self._np_climate_data, missing_data = self._dbMgr.rd_climate_data()
-                self._dbMgr.close()
+                self.station = _s
                 break
-            else:
-                self._station = None
 
-        self._np_alldoy_mean = {}  # Mean Across all Years for each Day, shape = (366,)
-        for _key in ['tmin', 'tmax', 'prcp']:
-            self._np_alldoy_mean[_key] = np.nanmean(self._np_climate_data[:, :][_key], axis=0)
+    def update_stations(self):
+        """ Update each station DB with the NOAA data missing for updYrList.
+            Each station has its own DB file, so stations are updated concurrently.
+            Their downloads share _download_slots, at most MAX_DOWNLOADS NOAA requests are in flight.
+            Safe to run in a worker thread, only the DB files are written, see reload()
+        """
+        if self._updStations:
+            # Network bound, a thread per station, _download_slots limits the downloads actually in flight
+            with ThreadPoolExecutor(max_workers=len(self._updStations)) as executor:
+                list(executor.map(lambda _upd: self.update_db(*_upd, self._noaaObj, self._updYrList),
+                                  self._updStations))
+
+    def cancel_update(self):
+        """ Stop a running update_stations(), e.g. when the Gui is closed.  Downloads not yet started are skipped,
+            a station whose downloads were cut short writes nothing.  Years already committed are kept.
+        """
+        self._update_cancel.set()
+
+    def reload(self):
+        """ Drop the in-memory Climate Data of all stations & re-read the selected station from its DB
+        """
+        self._station_data = {}
+        self._alldoy_cache.clear()
+        if self._station is not None:
+            self.station = self._station
 
     @property
     def yrList(self):
@@ -202,16 +232,26 @@ class ClimateDataObj:
 
     @station.setter
     def station(self, newval):
-        dbFilePath = os.path.join(self._dbDir, newval + '.db')
+        """ A station's Climate Data is read from its DB once, then kept in memory for later selections
+        """
+        if newval not in self._station_data:
+            dbFilePath = os.path.join(self._dbDir, newval + '.db')
 
-        self._dbMgr.open(dbFilePath)
-        self._yrList, self._np_climate_data, missing_data = self._dbMgr.rd_climate_data()
-        self._dbMgr.close()
-        self._station = newval
+            self._dbMgr.open(dbFilePath)
+            yrList, np_climate_data, missing_data = self._dbMgr.rd_climate_data_cached()
+            self._dbMgr.close()
 
-        self._np_alldoy_mean = {}  # Mean Across all Years for each Day, shape = (366,)
-        for _key in ['tmin', 'tmax', 'prcp']:
-            self._np_alldoy_mean[_key] = np.nanmean(self._np_climate_data[:, :][_key], axis=0)
+            # A single float32 [field, yr, day] array, each field a contiguous [yr, day] view, plot data is built per field
+            fields_3d = np.ascontiguousarray(np.moveaxis(rfn.structured_to_unstructured(np_climate_data), -1, 0))
+            np_fields = dict(zip(np_climate_data.dtype.names, fields_3d))
+
+            np_alldoy_mean = {}  # Mean Across all Years for each Day, shape = (366,)
+            for _key in ['tmin', 'tmax', 'prcp']:
+                np_alldoy_mean[_key] = np.nanmean(np_fields[_key], axis=0)
+            self._station_data[newval] = (yrList, np_climate_data, np_fields, np_alldoy_mean)
+
+        self._yrList, self._np_climate_data, self._np_fields, self._np_alldoy_mean = self._station_data[newval]
+        self._station = newval
 
     @property
     def stationList(self):
@@ -226,32 +266,21 @@ class ClimateDataObj:
                               'station': self._station,
                               'ma_winsz': self._ma_numdays}
 
+        obs = [self._np_fields[_name][:, day] for _name in dnames]
+        ma = [ClimateDataObj.moving_average(self._np_fields[_name], day, self._ma_numdays) for _name in dnames]
+
         # Construct ndarray's with nan pts removed and x, y combined into single array
-        maList = []
-        obsList = []
-        for _name in dnames:
-            obs = self._np_climate_data[:, day][_name]
-            goodIndx = np.argwhere(~np.isnan(obs))
-
-            y = obs[goodIndx].flatten()
-            x = goodIndx.flatten()
-            obsList.append(np.stack((x, y), axis=1).astype(np.float32))  # (M x 1, M x 1) -> M x 2
-
-            ma = ClimateDataObj.moving_average(self._np_climate_data[_name], day, self._ma_numdays)
-            goodIndx = np.argwhere(~np.isnan(ma))
-
-            y = ma[goodIndx].flatten()
-            x = goodIndx.flatten()
-            maList.append(np.stack((x, y), axis=1).astype(np.float32))
-
-        if len(obsList) == 1:
-            rtnDict['obs'] = obsList[0]
-            rtnDict['ma'] = maList[0]
-        elif len(obsList) == 2:
-            rtnDict['obs'] = np.stack(obsList)  # (M x 2, M x 2) -> 2 x M x 2
-            rtnDict['ma'] = np.stack(maList)
-        else:
-            raise ValueError
+        # A single mask for all dnames, so tmin & tmax always have the same M and can be stacked
+        for _name, _list in {'obs': obs, 'ma': ma}.items():
+            x = np.flatnonzero(~np.logical_or.reduce([np.isnan(_nparray) for _nparray in _list]))
+            xyList = [np.stack((x, _nparray[x]), axis=1).astype(np.float32) for _nparray in _list]  # M x 2
+
+            if len(xyList) == 1:
+                rtnDict[_name] = xyList[0]
+            elif len(xyList) == 2:
+                rtnDict[_name] = np.stack(xyList)  # (M x 2, M x 2) -> 2 x M x 2
+            else:
+                raise ValueError
         return rtnDict
 
     def sngldoy_data(self, dtype: PLOT_DATA, day: int) -> Dict[str, np.ndarray]:
@@ -285,9 +314,9 @@ class ClimateDataObj:
         obs = []
         avg = []
         for name in dnames:
-            obs.append(self._np_climate_data[:, day][name])
+            obs.append(self._np_fields[name][:, day])
 
-            sub_array = self._np_climate_data[:, avg_indicies][name]
+            sub_array = self._np_fields[name][:, avg_indicies]
             if np.any(roll_indicies):
                 roll_array = np.roll(sub_array[:, roll_indicies], shift=1, axis=0)
                 sub_array[:, roll_indicies] = roll_array
@@ -298,19 +327,10 @@ class ClimateDataObj:
             avg.append(obsMean)
 
         # Construct ndarray's with nan pts removed and x, y combined into single array
+        # A single mask for all dnames, tmin & tmax are only kept as a pair so both share the same x
         for _name, _list in {'obs': obs, 'avg': avg}.items():
-            goodList = []
-            for _nparray in _list:
-                goodIndx = np.argwhere(~np.isnan(_nparray))
-                y = _nparray[goodIndx].flatten()
-                x = goodIndx.flatten()
-                goodList.append(np.stack((x, y), axis=1).astype(np.float32))  # (M x 1, M x 1) -> M x 2
-
-            if len(goodList) == 1:
-                rtnDict[_name] = goodList[0]
-            elif len(goodList) == 2:
-                ptStack = np.stack(goodList)  # (M x 2, M x 2) -> 2 x M x 2
-                rtnDict[_name] = np.swapaxes(ptStack, 0, 1)  # 2 x M x 2      -> M x 2 x 2
+            x = np.flatnonzero(~np.logical_or.reduce([np.isnan(_nparray) for _nparray in _list]))
+            rtnDict[_name] = _xy_points(x, [_nparray[x] for _nparray in _list], np.float32)
 
         return rtnDict
 
@@ -323,7 +343,20 @@ class ClimateDataObj:
             Return Climate Temperature for 12 Months, starting @ month mstart
             X-Axis is always enumerated 0-365, but corresponding dates may be offset by _doy_xorigin
 
+            The last ALLDOY_CACHE_SIZE results are kept, each call returns a new dict (callers clear() it)
         """
+        key = (self._station, dtype, tuple(xorigin), self._ma_numdays)
+        if key in self._alldoy_cache:
+            self._alldoy_cache.move_to_end(key)
+            return dict(self._alldoy_cache[key])
+
+        ddict = self._alldoy_data(dtype, xorigin)
+        self._alldoy_cache[key] = ddict
+        if len(self._alldoy_cache) > ALLDOY_CACHE_SIZE:
+            self._alldoy_cache.popitem(last=False)
+        return dict(ddict)
+
+    def _alldoy_data(self, dtype, xorigin) -> Dict[str, np.ndarray]:
         ma_winsize = self._ma_numdays
         ma_winsize_2 = int(ma_winsize / 2.)
 
@@ -357,8 +390,8 @@ class ClimateDataObj:
                 # postfix_slice = np.arange(xorigin.dayenum, xorigin.dayenum + xorigin.dayenum)
 
             # Climate Data for each dname, adjusted for xorigin
-            d1 = self._np_climate_data[xorigin.yrenum][name][xorigin.dayenum:]
-            d2 = np.empty(0) if datayr2 is None else self._np_climate_data[datayr2][name][:xorigin.dayenum]
+            d1 = self._np_fields[name][xorigin.yrenum, xorigin.dayenum:]
+            d2 = np.empty(0) if datayr2 is None else self._np_fields[name][datayr2, :xorigin.dayenum]
             ddict[name] = np.concatenate((d1, d2))
             obs.append(ddict[name])
 
@@ -369,42 +402,32 @@ class ClimateDataObj:
 
             # The N-Pt Moving average for each day, across the N/2 prceeding, following days
             try:
-                prefix_data = self._np_climate_data[prefix_yr][name][prefix_slice]
+                prefix_data = self._np_fields[name][prefix_yr, prefix_slice]
             except IndexError:
                 prefix_data = np.zeros(ma_winsize_2, dtype=d1.dtype)
 
             try:
-                postfix_data = self._np_climate_data[postfix_yr][name][-ma_winsize_2:]
+                postfix_data = self._np_fields[name][postfix_yr, -ma_winsize_2:]
             except IndexError:
                 postfix_data = np.zeros(ma_winsize_2, dtype=d1.dtype)
 
             extended_data = np.concatenate((prefix_data, ddict[name], postfix_data))
             np.nan_to_num(extended_data, copy=False)
 
-            ma_vals = np.convolve(extended_data, np.ones(ma_winsize, dtype=ddict[name].dtype)) / ma_winsize
-            ddict['ma'].append(ma_vals[ma_winsize - 1:-ma_winsize + 1])
+            # Boxcar sums as differences of a running sum, O(N) for any ma_winsize (float64 limits round off)
+            run_sum = np.empty(extended_data.size + 1, dtype=np.float64)
+            run_sum[0] = 0.
+            np.cumsum(extended_data, out=run_sum[1:])
+            ma_vals = (run_sum[ma_winsize:] - run_sum[:-ma_winsize]) * (1. / ma_winsize)
+            ddict['ma'].append(ma_vals.astype(ddict[name].dtype))
 
             # ddict[name+'_avg'] = np.nanmean(np_data)
             # ddict[name+'_stdev'] = np.nanstd(np_data)
 
         # Very Ugly & Confusing, Precip Data is 1xM, Temp Data is 2xM
-        good_indx = [np.argwhere(~np.isnan(_nparray)).flatten() for _nparray in obs]
-        if len(good_indx) > 1:
-            good_indx = np.intersect1d(*good_indx)
-        else:
-            good_indx = good_indx[0]
-
-        good_data = [_nparray[good_indx] for _nparray in obs]
-        good_obs = [np.stack((good_indx, y), axis=1) for y in good_data]
-
-        if len(good_obs) == 1:
-            ddict['obs'] = good_obs[0]
+        good_indx = np.flatnonzero(~np.logical_or.reduce([np.isnan(_nparray) for _nparray in obs]))
 
-        elif len(good_obs) == 2:
-            ptStack = np.stack(good_obs)  # (M x 2, M x 2) -> 2 x M x 2
-            ddict['obs'] = np.swapaxes(ptStack, 0, 1)  # 2 x M x 2      -> M x 2 x 2
-        else:
-            raise ValueError
+        ddict['obs'] = _xy_points(good_indx, [_nparray[good_indx] for _nparray in obs], np.float64)
         return ddict
 
     def update_db(self, station: STATION_T, dbFilePath, webAccessObj, upd_yrs):
@@ -413,88 +436,135 @@ class ClimateDataObj:
          If missing data is found, attempt Download from NOAA & Update DB.
            Each sub-array of climate data has exactly 366 elements
            non-leap-year sub-array's are expected to be void for Feb-29 and are ignored.
-           Only the years now - upd_yrs are checked.
+           Only the years in upd_yrs are read from the DB & checked, older years are never scanned.
+           Years found fully populated are recorded in the DB (see dbCoupler.wr_complete_years) & not scanned again.
+           Status lines are buffered and written to stdout once.
 
          Returns: list of dbFiles discovered
         """
+        dbMgr = dbCoupler()           # A dbCoupler per call, update_db may run in several threads
+        dbMgr.open(dbFilePath, wal=True)
+        try:
+            self._update_db(station, dbMgr, webAccessObj, upd_yrs)
+        finally:
+            dbMgr.close()
+
+    def _update_db(self, station: STATION_T, dbMgr: dbCoupler, webAccessObj, upd_yrs):
+        """ update_db() of the open DB of dbMgr.  The DB is only locked (BEGIN IMMEDIATE) if there are rows to write,
+            all writes are then committed together or rolled back.
+        """
         dayenumLim, yrLim = date2enum(date.today())  # Update Scan Limit
         upd_fldNames = [_name for _name in DBTYPE_CDO._fields if _name != 'date']
+        upd_fldGetter = attrgetter(*upd_fldNames)     # DBTYPE_CDO -> tuple of upd_fldNames values
 
-        self._dbMgr.open(dbFilePath)
+        dbYears = dbMgr.table_years
+        log_lines = [f'  {station.alias:10} Years: {dbYears[0]} - {dbYears[-1]}']  # stdout, written once
 
-        yrList, np_climate_data, missing_data = self._dbMgr.rd_climate_data()
-        print(f'  {station.alias:10} Years: {yrList[0]} - {yrList[-1]}')
+        # Years found fully populated by an earlier scan are neither read nor scanned again
+        complete_yrs = dbMgr.rd_complete_years()
+        scan_yrs = [_yr for _yr in upd_yrs if _yr not in complete_yrs]
 
-        if yrList[-1] != date.today().year:
+        # Per docstring, only upd_yrs are needed: yrList/np_climate_data are limited to those years
+        yrList, np_climate_data, missing_data = dbMgr.rd_climate_data(scan_yrs)
+        if not yrList or yrList[-1] != date.today().year:
             yrList.append(date.today().year)
 
-        # Loop Over All Years, climate data is 2D array of records [yrs, days]
         # !! It is possible that Climate data Needs to add a New Year !!
-        stationStatusDict = {}
-        for _chkyear in upd_yrs:
+        if np_climate_data.shape[0] < len(yrList):
+            new_cd = np.full((len(yrList) - np_climate_data.shape[0], 366), np.nan, dtype = np_climate_data.dtype)
+            np_climate_data = np.vstack((np_climate_data, new_cd))
+
+        # Fields as a contiguous float32 [yrenum, dayenum, field] array, fields match upd_fldNames
+        isnan_3d = np.isnan(rfn.structured_to_unstructured(np_climate_data))
+
+        # 1st Pass: Find db rows with ANY missing data for each year & which years need a NOAA download
+        fetch_yrs = []
+        for _chkyear in scan_yrs:
+            _yrenum = yrList.index(_chkyear)
+            void = isnan_3d[_yrenum].any(axis=1)
+
+            chk_void = void.copy()
+            if not dbCoupler.is_leap_year(_chkyear):  # Feb29 of non-leap years is always void
+                chk_void[59] = False
+            if _yrenum == len(yrList) - 1:              # days from today onward are not yet available
+                chk_void[dayenumLim:] = False
+            if chk_void.any():
+                fetch_yrs.append(_chkyear)
+
+        # Download all required years concurrently, the downloads are network bound.
+        # Other stations may be downloading too, _download_slots limits the total to MAX_DOWNLOADS
+        def download(_yr):
+            with self._download_slots:
+                if self._update_cancel.is_set():
+                    return None
+                return webAccessObj.get_dataset_v1(station.id, date(_yr, 1, 1))
+
+        new_by_year = {}
+        if fetch_yrs:
+            with ThreadPoolExecutor(max_workers=MAX_DOWNLOADS) as executor:
+                new_by_year = dict(zip(fetch_yrs, executor.map(download, fetch_yrs)))
+        if self._update_cancel.is_set():
+            return
+
+        # 2nd Pass: Loop Over All Years, climate data is 2D array of records [yrs, days]
+        stationStatusDict = {_yr: {'Valid': 366 if dbCoupler.is_leap_year(_yr) else 365, 'Partial': 0, 'Missing': 0}
+                             for _yr in upd_yrs if _yr in complete_yrs}
+        new_complete_yrs = []
+        add_rows = []  # (tblName, [DBTYPE_CDO]) & (tblName, where_dict, set_dict) of all years, written at the end
+        upd_rows = []
+        for _chkyear in scan_yrs:
             _yrenum = yrList.index(_chkyear)
 
             yrstatus = {'Valid': 0, 'Partial': 0, 'Missing': 0}
+            is_leap = dbCoupler.is_leap_year(_chkyear)  # once per year, not per missing day
 
-            new_indx = 0
             new_vals = None
-
-            # Find db rows with ANY missing data
-            # print(_yrenum, type(np_climate_data), np_climate_data.shape)
-            if np_climate_data.shape[0] <= _yrenum:
-                new_cd = np.full((1, 366), np.nan, dtype = np_climate_data.dtype)
-                np_climate_data = np.vstack((np_climate_data, new_cd))
-
-                # print(np_climate_data.dtype)
-                # print(new_cd.shape)
-                # print(new_cd.dtype)
-                # print(upd_cd.shape)
-                # raise ValueError
-
-            void = [np.any([np.isnan(x) for x in y]) for y in np_climate_data[_yrenum, :]]
-            isnan_grpsize = [(_k, sum(1 for _ in _v)) for _k, _v in groupby(void)]
-            isnan_dayenum = [0] + list(accumulate([x[1] for x in isnan_grpsize]))
-            assert isnan_dayenum[-1] == np_climate_data.shape[1]  # the sum of all grp elements should == 366
-
-            for _grpidx, _isnan_grp in enumerate(isnan_grpsize):
-                ismissing = _isnan_grp[0]
-                nummissing = _isnan_grp[1]
-
-                dayenum = isnan_dayenum[_grpidx]
-                if _yrenum == len(yrList) - 1 and dayenum == dayenumLim:  # yrenum, dayenum past today?
-                    break
-
-                if not ismissing:
-                    yrstatus['Valid'] += nummissing
-                    continue
-
+            add_cdos = []  # AddNew rows of this year, written by a single add_climate_data()
+            isnan_matrix = isnan_3d[_yrenum]  # isnan for each [dayenum, field] of this year
+            void = isnan_matrix.any(axis=1)
+
+            # Fully populated years (ignoring Feb29 of non-leap years) need no further checks
+            if not (void.any() if is_leap else np.delete(void, 59).any()):
+                yrstatus['Valid'] = 366 if is_leap else 365
+                stationStatusDict[_chkyear] = yrstatus
+                new_complete_yrs.append(_chkyear)
+                continue
+
+            # Runs of equal void values: start dayenum, size & void flag of each run, from changes in void
+            grp_starts = np.flatnonzero(np.diff(np.r_[~void[0], void]))
+            grp_sizes = np.diff(np.r_[grp_starts, void.size])
+            grp_flags = void[grp_starts]
+
+            # Current year: the run starting today & all later runs are not scanned
+            grp_end = None
+            if _yrenum == len(yrList) - 1 and dayenumLim in grp_starts:
+                grp_end = int(np.flatnonzero(grp_starts == dayenumLim)[0])
+            grp_starts, grp_sizes, grp_flags = grp_starts[:grp_end], grp_sizes[:grp_end], grp_flags[:grp_end]
+
+            # Valid runs are only counted, the loop visits just the void runs
+            yrstatus['Valid'] += int(grp_sizes[~grp_flags].sum())
+
+            for dayenum, nummissing in zip(grp_starts[grp_flags].tolist(), grp_sizes[grp_flags].tolist()):
                 while nummissing:
-                    if dayenum == 59 and not self._dbMgr.is_leap_year(_chkyear):  # Skip Feb29 if not LeapYear
+                    if dayenum == 59 and not is_leap:  # Skip Feb29 if not LeapYear
                         dayenum += 1
                         nummissing -= 1
                         continue
 
-                    current_vals = [np_climate_data[_yrenum, dayenum][_fld]  # This day's current Climate Data
-                                    for _fld in upd_fldNames]
-                    current_isnan = [np.isnan(x) for x in current_vals]
+                    current_isnan = isnan_matrix[dayenum]  # This day's current Climate Data isnan
 
-                    if new_vals is None:
-                        new_vals = webAccessObj.get_dataset_v1(station.id, date(_chkyear, 1, 1))
-                        if new_vals is None:
-                            print('--- webAccess Failed!')
+                    if not new_vals:
+                        new_vals = new_by_year.get(_chkyear)
+                        if not new_vals:
+                            log_lines.append('--- webAccess Failed!')
                             break
+                        new_by_date = {_cdo.date: _cdo for _cdo in new_vals}  # iso date str -> DBTYPE_CDO
 
-                    missingDate = date(_chkyear, *dayInt2MMDD(dayenum))
-                    while True:
-                        newCDO_date = date.fromisoformat(new_vals[new_indx].date)
-                        if newCDO_date >= missingDate or new_indx + 1 >= len(new_vals):
-                            break
-                        else:
-                            new_indx += 1
+                    missingDate = date(_chkyear, *_DAY2MMDD[dayenum])
+                    new_cdo = new_by_date.get(missingDate.isoformat())
 
-                    if newCDO_date == missingDate:  # New Download Date Matches Missing
-                        newcd_vals = [getattr(new_vals[new_indx], _fld)
-                                      for _fld in upd_fldNames]
+                    if new_cdo is not None:  # New Download Date Matches Missing
+                        newcd_vals = upd_fldGetter(new_cdo)
 
                         new_isvalid = [bool(_value) for _value in newcd_vals]
                         isnan_and_isvalid = [all(test_tuple) for test_tuple in zip(new_isvalid, current_isnan)]
@@ -504,27 +574,24 @@ class ClimateDataObj:
                         else:
                             yrstatus['Partial'] += 1
 
-                        info = ', '.join([f'{_fld}:{_val}' for _change, _fld, _val
-                                          in zip(isnan_and_isvalid, upd_fldNames, newcd_vals) if _change])
-
-                        if all(current_isnan):
+                        if current_isnan.all():
                             loginfo = 'AddNew'
-                            self._dbMgr.add_climate_data(str(missingDate.year), [new_vals[new_indx]])
+                            add_cdos.append(new_cdo)
 
                         elif any(isnan_and_isvalid):
                             loginfo = 'Revise'
-                            upd_dict = dict([(_k, _v) for _k, _v in zip(upd_fldNames, newcd_vals) if _v])
+                            upd_dict = {_k: _v for _k, _v in zip(upd_fldNames, newcd_vals) if _v}
                             # upd_dict = dict(zip(upd_fldNames, newcd_vals))
-                            self._dbMgr.upd_climate_data(str(missingDate.year),
-                                                         {'date': missingDate.isoformat()},
-                                                         upd_dict)
+                            upd_rows.append((str(missingDate.year), {'date': missingDate.isoformat()}, upd_dict))
                         else:
                             loginfo = None
 
-                        if loginfo:
-                            self._logger.info(f'{loginfo} {station.alias:10} {missingDate} {info}')
+                        if loginfo and self._logger.isEnabledFor(logging.INFO):  # info only built if logged
+                            info = ', '.join([f'{_fld}:{_val}' for _change, _fld, _val
+                                              in zip(isnan_and_isvalid, upd_fldNames, newcd_vals) if _change])
+                            self._logger.info('%s %-10s %s %s', loginfo, station.alias, missingDate, info)
                     else:
-                        if all(current_isnan):
+                        if current_isnan.all():
                             yrstatus['Missing'] += 1
                         else:
                             yrstatus['Partial'] += 1
@@ -534,9 +601,26 @@ class ClimateDataObj:
 
                     if _yrenum == np_climate_data.shape[0] - 1 and dayenum > dayenumLim:
                         break
+            if add_cdos:
+                add_rows.append((str(_chkyear), add_cdos))
             stationStatusDict[_chkyear] = yrstatus
 
-        for _yr, _stat in stationStatusDict.items():
-            print(f'{_yr:>19}: ' + ','.join(f'{_k}: {_v:>3}' for _k, _v in _stat.items()))
-
-        self._dbMgr.close()
+        # The adds/updates of all years are committed together, a DB with nothing to write is never locked
+        if add_rows or upd_rows or new_complete_yrs:
+            dbMgr.begin()
+            try:
+                for _tblName, _cdos in add_rows:
+                    dbMgr.add_climate_data(_tblName, _cdos)
+                for _tblName, _where, _upd in upd_rows:
+                    dbMgr.upd_climate_data(_tblName, _where, _upd)
+                if new_complete_yrs:
+                    dbMgr.wr_complete_years(new_complete_yrs)
+                dbMgr.commit()
+            except BaseException:
+                dbMgr.rollback()
+                raise
+
+        for _yr in upd_yrs:
+            _stat = stationStatusDict[_yr]
+            log_lines.append(f'{_yr:>19}: ' + ','.join(f'{_k}: {_v:>3}' for _k, _v in _stat.items()))
+        sys.stdout.write('\n'.join(log_lines) + '\n')
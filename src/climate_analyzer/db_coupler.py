@@ -13,12 +13,14 @@
    Example CMD: '(rowid, conceptID, treedepth, weight, balance, factIDs) VALUES(?,?,?,?,?,?)'
 """
 import os
+import json
 import array
 import sqlite3
 import numpy as np
 
 # from datetime import date
 from typing import List, Dict
+from operator import attrgetter
 from collections import namedtuple
 
 # Climate Data Observation
@@ -38,9 +40,20 @@ DBDEF_CDO = [('date',        'TEXT'    'PRIMARY KEY'),
 DBTYPE_FIP = namedtuple('DBTYPE_FIP',[x[0] for x in DBDEF_FIP], defaults=(-1, '', ''))
 DBTYPE_CDO = namedtuple('DBTYPE_CDO', [x[0] for x in DBDEF_CDO],  defaults=('',) +  (float('nan'),)*6)
 
+_CDO_GET = attrgetter(*DBTYPE_CDO._fields)                          # DBTYPE_CDO -> row tuple for executemany
+
 CDFLDS_NODATE = [x for x in DBTYPE_CDO._fields if x != 'date']   # field names of Climate Data Only, No Date
+CDFLDS_NODATE_UPPER = [x.upper() for x in CDFLDS_NODATE]         # same, as shown in the Gui
 CD_NODATE_NPDT = np.dtype([(_key, np.float32) for _key in CDFLDS_NODATE])
 DB_DEFINES = {'DBDEF_CDO': DBDEF_CDO, 'DBDEF_FIP': DBDEF_FIP}                 # dbCoupler.__init__() uses to set cmd/def strings
+YRS_COMPLETE_TBL = 'years_complete'        # Not a year table: years with every day & field populated
+
+# rd_climate_data() SELECT list: day_of_yr computed by SQLite, TEXT placeholders ('') as NULL -> nan
+#   day_of_yr always counts Feb29, so MM-DD is evaluated in leap year 2000
+_DAY_OF_YR_SQL = "(CAST(strftime('%j', '2000' || substr(date, 5)) AS INTEGER) - 1)"
+_RD_CD_COLS = ','.join(['date', _DAY_OF_YR_SQL] +
+                       ["CASE WHEN typeof({0}) = 'text' THEN NULL ELSE {0} END".format(_f) for _f in CDFLDS_NODATE])
+_MM_CUM = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)    # day_of_yr of 1st of each month, Feb29 included
 
 
 class dbCoupler:
@@ -59,9 +72,10 @@ class dbCoupler:
 
     @staticmethod
     def updRowCmd(tblName, whereDict, setDict):
-        setText = ','.join('{} = {}'.format(_k, _v) for _k, _v in setDict.items())
-        whereText = ','.join('{} = "{}"'.format(_k, _v) for _k, _v in whereDict.items())
-        return 'UPDATE "{}" SET {} WHERE {}'.format(tblName, setText, whereText)
+        setText = ','.join('{} = ?'.format(_k) for _k in setDict)
+        whereText = ' AND '.join('{} = ?'.format(_k) for _k in whereDict)
+        return 'UPDATE "{}" SET {} WHERE {}'.format(tblName, setText, whereText), \
+               tuple(setDict.values()) + tuple(whereDict.values())
 
     @staticmethod
     def repRowCmd(tblName, tblRow):
@@ -69,7 +83,7 @@ class dbCoupler:
 
     @staticmethod
     def findCmd(tblName, key_val1, key_val2):
-        return 'SELECT * FROM {} WHERE {} = "{}"'.format(tblName, key_val1[0], key_val1[1])
+        return 'SELECT * FROM {} WHERE {} = ?'.format(tblName, key_val1[0]), (key_val1[1],)
 
     @staticmethod
     def is_leap_year(year):
@@ -77,14 +91,19 @@ class dbCoupler:
 
     @staticmethod
     def mmdd2enum(month, day):
-        mm2days = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        return sum(mm2days[:month-1]) + day-1
+        return _MM_CUM[month-1] + day-1
 
     @property
     def table_names(self):
         self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         return [x[0] for x in self.cursor.fetchall()]
 
+    @property
+    def table_years(self):
+        """ Climate Data table names as int years, other tables (i.e. YRS_COMPLETE_TBL) are excluded
+        """
+        return [int(x) for x in self.table_names if x.isdigit()]
+
     def __init__(self):
         """ Create strings for sqlite3 DB Operations.
             Each Table needs 2 strings:
@@ -95,6 +114,7 @@ class dbCoupler:
         self.dbFileName = None
         self.conn = None
         self.cursor = None
+        self._in_transaction = False  # True between begin() & commit(), writes are not committed
 
         for _key, _pydef in DB_DEFINES.items():
             _dbdef = '(' + ','.join([' '.join(x) for x in _pydef]) + ');'
@@ -105,9 +125,12 @@ class dbCoupler:
             _cmdattr = _key.replace('DEF', 'CMD')
             setattr(self, _cmdattr, _dbcmd)
 
-    def open(self, dbFileName):
+    def open(self, dbFileName, readonly=False, wal=False):
         """ sqlite3 will always create a database file if it doesn't exist
             filemode = rwc.  There is no way to force it NOT to create!
+            readonly DB's (e.g. fips_codes.db) are opened query_only.
+            wal = True switches the DB to WAL journal_mode (persistent), only for the station DBs that get
+            updated.  fips_codes.db must stay in DELETE mode so it can be opened from a read-only install.
         """
         if self.dbFileName is not None and self.dbFileName != dbFileName:
             raise Exception('dbCoupler Multiple Open Files')
@@ -120,39 +143,132 @@ class dbCoupler:
         self.conn = sqlite3.connect(dbFileName)
 
         self.conn.execute('PRAGMA foreign_keys = 1')
+        self.conn.execute('PRAGMA mmap_size = 268435456')   # read pages via mmap, rd_climate_data scans all tables
+        self.conn.execute('PRAGMA cache_size = -65536')     # 64MB page cache
+        self.conn.execute('PRAGMA temp_store = MEMORY')
+        self.conn.execute('PRAGMA synchronous = NORMAL')   # fewer fsyncs on commit
+        if readonly:
+            self.conn.execute('PRAGMA query_only = 1')
+        elif wal:
+            self.conn.execute('PRAGMA journal_mode = WAL')  # with synchronous = NORMAL, no fsync per commit
         self.cursor = self.conn.cursor()
 
     def close(self):
         self.conn.close()
         self.cursor = None
         self.dbFileName  = None
+        self._in_transaction = False
+
+    def begin(self):
+        """ Start a transaction, add/upd_climate_data writes are held until commit()
+        """
+        self.cursor.execute('BEGIN IMMEDIATE')
+        self._in_transaction = True
+
+    def commit(self):
+        """ Commit all writes since begin() as a single transaction
+        """
+        self.conn.commit()
+        self._in_transaction = False
+
+    def rollback(self):
+        """ Discard all writes since begin()
+        """
+        self.conn.rollback()
+        self._in_transaction = False
 
-    def rd_climate_data(self) -> (List[int], np.ndarray, Dict[int, tuple]):
+    def rd_climate_data(self, years=None) -> (List[int], np.ndarray, Dict[int, tuple]):
         """ Read Climate Data from SQLite DB & return as (LIST_OF_YRS,NUMPY_2D_Array)
             NUMPY_2D is structured as [yr, day_of_yr] of dtype CD_NODATE_NPDT
+            If years is supplied, only those year tables are read.
         """
 
         # A list of years and 2D Array initialized to nan
-        tbl_years = [int(x) for x in self.table_names]
-        cd_by_year = np.full((len(tbl_years), 366), np.nan, dtype = CD_NODATE_NPDT)
+        tbl_years = self.table_years
+        if years is not None:
+            tbl_years = [x for x in tbl_years if x in years]
+        # Filled as homogeneous float32 [yr, day_of_yr, fld] & returned as a zero copy CD_NODATE_NPDT view
+        cd_float = np.full((len(tbl_years), 366, len(CDFLDS_NODATE)), np.nan, dtype = np.float32)
         missing_data = {}
 
+        # Each year tbl is fetched in one call & scattered into cd_by_year by its day_of_yr column
         for tblnum, _yr in enumerate(tbl_years):
-            cdtbl = self.rd_cdtable(_yr)   # _yr is int here, latter converted to str
+            rows = self.cursor.execute('SELECT ' + _RD_CD_COLS + ' FROM "{}"'.format(_yr)).fetchall()
+            _count = len(rows) - 1
+            _lastdate = rows[-1][0] if rows else None
 
-            for _count, _cdrec in enumerate(cdtbl):
-                mmdd = getattr(_cdrec, 'date').split('-')
-                recnum = dbCoupler.mmdd2enum(*[int(x) for x in mmdd[1:]])
-                cdvals = [getattr(_cdrec, x) for x in CDFLDS_NODATE]
-
-                cd_by_year[tblnum, recnum] = tuple([np.nan if type(x) is str else np.float32(x) for x in cdvals])
+            if rows:
+                _, recnum, *_vals = zip(*rows)
+                cd_float[tblnum, recnum, :] = np.array(_vals, dtype=np.float32).T
 
             # Data Sanity Check
             if (_count == 365 and dbCoupler.is_leap_year(_yr)) or \
               (_count == 364 and not dbCoupler.is_leap_year(_yr)):
                 continue
-            missing_data[_yr] = (_count, _cdrec.date)
-            # print(f'  !{_yr} Missing Data! Records Read = {_count}, Last Data = {_cdrec.date}')
+            missing_data[_yr] = (_count, _lastdate)
+            # print(f'  !{_yr} Missing Data! Records Read = {_count}, Last Data = {_lastdate}')
+
+        cd_by_year = cd_float.view(CD_NODATE_NPDT)[..., 0]
+        return tbl_years, cd_by_year, missing_data
+
+    def tbl_signatures(self, tbl_years) -> Dict[str, list]:
+        """ A cheap signature for each year table: row count + per field (count of values, sum of values,
+            sum of values weighted by day_of_yr + 1).  Computed by sqlite aggregates, the weighted sum
+            changes when values move between days, so any add/update of a row changes the signature.
+        """
+        sig_cmd = 'SELECT COUNT(*),' + \
+                  ','.join(f"COUNT(NULLIF({_f}, '')),TOTAL({_f}),TOTAL({_f} * ({_DAY_OF_YR_SQL} + 1))"
+                           for _f in CDFLDS_NODATE) + ' FROM "{}"'
+        return {str(_yr): list(self.cursor.execute(sig_cmd.format(_yr)).fetchone()) for _yr in tbl_years}
+
+    def rd_climate_data_cached(self) -> (List[int], np.ndarray, Dict[int, tuple]):
+        """ Same result as rd_climate_data() but uses a sidecar cache of the array: <dbFile>.cache.npy
+            A manifest <dbFile>.cache.json holds the signature of each year table when cached.
+            Only year tables whose signature has changed are read from the DB.
+        """
+        npyName = self.dbFileName + '.cache.npy'
+        jsonName = self.dbFileName + '.cache.json'
+
+        tbl_years = self.table_years
+        signatures = self.tbl_signatures(tbl_years)
+
+        try:
+            with open(jsonName, 'r') as rfp:
+                manifest = json.load(rfp)
+            cached = np.load(npyName)
+            if cached.dtype != CD_NODATE_NPDT or cached.shape != (len(manifest['years']), 366):
+                raise ValueError
+        except (OSError, ValueError, KeyError):
+            manifest = {'years': [], 'signatures': {}, 'missing': {}}
+            cached = None
+
+        stale_years = [_yr for _yr in tbl_years if signatures[str(_yr)] != manifest['signatures'].get(str(_yr))]
+        if not stale_years and manifest['years'] == tbl_years:
+            missing_data = {int(_k): tuple(_v) for _k, _v in manifest['missing'].items()}
+            return tbl_years, cached, missing_data
+
+        new_years, new_data, new_missing = self.rd_climate_data(stale_years)
+
+        cd_by_year = np.empty((len(tbl_years), 366), dtype = CD_NODATE_NPDT)
+        missing_data = {}
+        for tblnum, _yr in enumerate(tbl_years):
+            if _yr in new_years:
+                cd_by_year[tblnum] = new_data[new_years.index(_yr)]
+                if _yr in new_missing:
+                    missing_data[_yr] = new_missing[_yr]
+            else:
+                cd_by_year[tblnum] = cached[manifest['years'].index(_yr)]
+                if str(_yr) in manifest['missing']:
+                    missing_data[_yr] = tuple(manifest['missing'][str(_yr)])
+
+        try:
+            np.save(npyName, cd_by_year)
+            with open(jsonName, 'w') as wfp:
+                json.dump({'years': tbl_years,
+                           'signatures': signatures,
+                           'missing': {str(_k): _v for _k, _v in missing_data.items()}}, wfp)
+        except OSError:
+            pass
 
         return tbl_years, cd_by_year, missing_data
 
@@ -163,9 +279,9 @@ class dbCoupler:
         key_val1 = ('state', val1.upper())
         key_val2 = ('region', val2) if val2 else None
         tblName = 'FIP_CODES'
-        cmd = dbCoupler.findCmd(tblName, key_val1, key_val2)
+        cmd, params = dbCoupler.findCmd(tblName, key_val1, key_val2)
 
-        self.cursor.execute(cmd)
+        self.cursor.execute(cmd, params)
         return list(map(DBTYPE_FIP._make, self.cursor.fetchall()))
 
     def find_rgn_by_code(self, val1, val2=None):
@@ -173,24 +289,25 @@ class dbCoupler:
         """
         key_val1 = ('code', int(val1))
         tblName = 'FIP_CODES'
-        cmd = dbCoupler.findCmd(tblName, key_val1, None)
+        cmd, params = dbCoupler.findCmd(tblName, key_val1, None)
 
-        self.cursor.execute(cmd)
+        self.cursor.execute(cmd, params)
         # return self.cursor.fetchall()
         return list(map(DBTYPE_FIP._make, self.cursor.fetchall()))
 
-    def wr_fiptable(self, tblName, key, value):
-        """ tblItemList = listOf(CONCEPTDETAILS)
+    def wr_fiptable(self, tblName, tblItemList):
+        """ tblItemList = listOf(DBTYPE_FIP) or of plain tuples in DBDEF_FIP column order
         """
         cmd = dbCoupler.newTableCmd(tblName, self.DBDEF_FIP)
         self.cursor.execute(cmd)
+        # find_rgn_by_state_and_locale() & find_rgn_by_code() lookups use these, not a table scan
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS "idx_{0}_state_region" ON "{0}" (state, region)'.format(tblName))
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS "idx_{0}_code" ON "{0}" (code)'.format(tblName))
 
         cmd = dbCoupler.wrRowCmd(tblName, self.DBCMD_FIP)
 
-        for _rowid, row in enumerate(tblItemList):
-            row_data = [getattr(row, _f) for _f in DBTYPE_FIP._fields]
-            self.cursor.execute(cmd, row_data)
-        self.conn.commit()
+        with self.conn:                 # a single transaction, committed on exit
+            self.conn.executemany(cmd, tblItemList)
 
     # -----CLIMATE DATA TABLE -------
     def wr_cdtable(self, tblName, tblItemList):
@@ -201,10 +318,8 @@ class dbCoupler:
 
         cmd = dbCoupler.wrRowCmd(tblName, self.DBCMD_CDO)
 
-        for _rowid, row in enumerate(tblItemList):
-            row_data = [getattr(row, _f) for _f in DBTYPE_CDO._fields]
-            self.cursor.execute(cmd, row_data)
-        self.conn.commit()
+        with self.conn:                 # a single transaction, committed on exit
+            self.conn.executemany(cmd, map(_CDO_GET, tblItemList))
 
     def rd_cdtable(self, tblName):
         self.cursor.execute('SELECT ' + ','.join(DBTYPE_CDO._fields) +
@@ -220,15 +335,32 @@ class dbCoupler:
 
         cmd = dbCoupler.wrRowCmd(tblname, self.DBCMD_CDO)
 
-        for _rowid, row in enumerate(tblitemlist):
-            row_data  = [getattr(row, _f) for _f in DBTYPE_CDO._fields]
-            self.cursor.execute(cmd, row_data)
-        self.conn.commit()
+        self.conn.executemany(cmd, map(_CDO_GET, tblitemlist))
+        if not self._in_transaction:
+            self.conn.commit()
+
+    def rd_complete_years(self):
+        """ Years recorded by wr_complete_years(), these need no scan for missing data
+        """
+        if YRS_COMPLETE_TBL not in self.table_names:
+            return set()
+        self.cursor.execute('SELECT year FROM "{}"'.format(YRS_COMPLETE_TBL))
+        return {x[0] for x in self.cursor.fetchall()}
+
+    def wr_complete_years(self, years):
+        """ Record years whose Climate Data has every day & field populated
+        """
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS "{}" (year INTEGER PRIMARY KEY)'.format(YRS_COMPLETE_TBL))
+        self.conn.executemany('INSERT OR IGNORE INTO "{}" (year) VALUES (?)'.format(YRS_COMPLETE_TBL),
+                              [(_yr,) for _yr in years])
+        if not self._in_transaction:
+            self.conn.commit()
 
     def upd_climate_data(self, tblName, where_dict, set_dict):
         """ Update Rows in tblname where rows match where dict
         """
-        cmd = self.updRowCmd(tblName, where_dict, set_dict)
+        cmd, params = self.updRowCmd(tblName, where_dict, set_dict)
 
-        self.cursor.execute(cmd)
-        self.conn.commit()
+        self.cursor.execute(cmd, params)
+        if not self._in_transaction:
+            self.conn.commit()
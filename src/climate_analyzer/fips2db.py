@@ -10,9 +10,11 @@ import os
 
 from glob import glob
 
-from dbCoupler import dbCoupler, DBTYPE_FIP
+from climate_analyzer.db_coupler import dbCoupler
 
 user_dbPath = 'AppData\\ClimateData'
+QTypes = frozenset({'county', 'parish', 'city', 'borough', 'area', 'park'})         # lower case, test with .lower()
+FIP_RE = re.compile(r'^\s+(\d{5})\s*(\S*)\s?(\S*)\s?(\S*)\s?(\S*)')     # fip_code, then up to 4 name/qualifier words
 
 StateAbrev = {'Alabama':             'AL',            
               'Alaska':              'AK',
@@ -68,54 +70,48 @@ StateAbrev = {'Alabama':             'AL',
 
 def fips2db(fsrc, dbfName):
 
-    with open(fsrc, 'r') as rfp:
-        src_lines = rfp.readlines()
-    rfp.close()
-
     fipList = []
-    QTypes = ['County', 'Parish', 'City', 'city','Borough', 'Area', 'Park'] 
     fip_1st2 = None
-    mobj = re.compile('^\s+(\d{5})\s*(\S*)\s?(\S*)\s?(\S*)\s?(\S*)') 
-    for _lcnt, _line in enumerate(src_lines):
-        found = mobj.match(_line)
-
-        fip_code = found.group(1)
-        region = found.group(2)
-        qualifier = None
 
-        if len(found.group(3)) == 0:
-            if (fip_code[2:] != '000'):
-                print(f'Ignore {fip_code} {region}')
+    with open(fsrc, 'r') as rfp:                # lines are streamed, the file is never held in memory
+        for _lcnt, _line in enumerate(rfp):
+            found = FIP_RE.match(_line)
+            if found is None:
                 continue
-            qualifier = 'State'      
 
-        elif found.group(3) in QTypes:
-            qualifier = found.group(3)
+            fip_code, region, grp3, grp4, grp5 = found.groups()
+            qualifier = None
 
-        elif found.group(4) in QTypes:
-            region += found.group(3)
-            qualifier = found.group(4)
+            if len(grp3) == 0:
+                if (fip_code[2:] != '000'):
+                    print(f'Ignore {fip_code} {region}')
+                    continue
+                qualifier = 'State'      
 
-        elif found.group(5) in QTypes:
-            region += found.group(4)
-            qualifier = found.group(5)
+            elif grp3.lower() in QTypes:
+                qualifier = grp3
 
-        else:
-            region += found.group(3) + found.group(4)
-            qualifier = 'State'
+            elif grp4.lower() in QTypes:
+                region = f'{region}{grp3}'
+                qualifier = grp4
 
-            if (fip_code[2:] != '000'):
-                print(f'Ignore {fip_code} {region}')
-                continue
+            elif grp5.lower() in QTypes:
+                region = f'{region}{grp4}'
+                qualifier = grp5
+
+            else:
+                region = f'{region}{grp3}{grp4}'
+                qualifier = 'State'
+
+                if (fip_code[2:] != '000'):
+                    print(f'Ignore {fip_code} {region}')
+                    continue
 
-        if fip_1st2 != fip_code[:2]:
-            fip_1st2 = fip_code[:2]
-            state_abrev = StateAbrev[region]
+            if fip_1st2 != fip_code[:2]:
+                fip_1st2 = fip_code[:2]
+                state_abrev = StateAbrev[region]
 
-        fipList.append(DBTYPE_FIP(code = fip_code,
-                                  state = state_abrev,
-                                  region = region,
-                                  qualifier = qualifier))
+            fipList.append((fip_code, state_abrev, region, qualifier))     # DBTYPE_FIP column order
 
     dbMgr = dbCoupler()
     dbMgr.open(dbfName)
@@ -2,19 +2,24 @@
 A tkinter GUI Class
 """
 from os import path
+from bisect import bisect_left
 from datetime import date
-from itertools import groupby, accumulate
 from collections import defaultdict
 
+import re
+import traceback
 import numpy as np
 import tkinter as tk
 import tkinter.ttk as ttk
+import tkinter.messagebox as messagebox
 
-from .db_coupler import dbCoupler
+from .db_coupler import dbCoupler, CDFLDS_NODATE_UPPER
 from .gui_plot import guiPlot, dayInt2MMDD, dayInt2Label, PLOT_TYPE
 from .gui_style import guiStyle
 from .climate_dataobj import ClimateDataObj
 
+_INT_RE = re.compile(r'-?[0-9]+')  # tkIntEntry text that int() always accepts
+
 class guiMain(tk.Tk):
     """A tk Application (i.e. Main/Root Window)
 
@@ -40,9 +45,13 @@ class guiMain(tk.Tk):
         self._ClimateDataObj = cdObj
         self._stations = cdObj.stationList
         self.np_climate_data = cdObj.np_data
+        self._n_years, self._n_days = self.np_climate_data.shape[:2]   # event handlers use these, not .shape
         self.yrList = cdObj.yrList
 
         self._station_index = self._stations.index(self._ClimateDataObj.station)
+        self._pending_motion = None                   # latest (x, y) of plot widget <Motion>, see on_motion
+        self._pending_plot = None                     # latest plot() args, see _queue_plot
+        self._motion_after_id = None
 
         # Initial Gui Setup
         self.title(f'Climate Data Analyzer {app_ver}')
@@ -63,8 +72,8 @@ class guiMain(tk.Tk):
         self._plot_widget.grid(row=0, column=0, rowspan=1, columnspan=8)
 
         # Column-0, Information Widget
-        self._info_text = tk.StringVar()                                          # Col-0, Information Widget
-        self._tk_info = ttk.Label(self, textvariable=self._info_text, width=40)
+        self._info_text = ''                                                      # Col-0, Information Widget
+        self._tk_info = ttk.Label(self, width=40)
         self._tk_info.grid(row=1, column=0, sticky='nsw')
 
         # Column-1, PDF Button
@@ -86,7 +95,7 @@ class guiMain(tk.Tk):
         self._ArgSelFrame.argvalue = self.yrList[init_yrenum]
 
         # Column-5, OptionMenu (Climate Data Fields)
-        self.cd_names = [x.upper() for x in self.np_climate_data.dtype.names]  # Numpy Structured Array Field Names
+        self.cd_names = CDFLDS_NODATE_UPPER                  # Numpy Structured Array Field Names, upper case
         self._ObserMenu = tkOptionMenu(self, self.cd_names, self.cd_names.index('PRCP'), self.on_ObserMenu)
         self._ObserMenu.grid(row=1, column=5, sticky='e')
 
@@ -102,11 +111,26 @@ class guiMain(tk.Tk):
     def selected_station(self):
         return self._stations[self._station_index]
 
+    def _queue_plot(self, *plot_args):
+        """ Plot requests of rapid callbacks are coalesced, only the latest is drawn when Tk is next idle
+        """
+        if self._pending_plot is None:
+            self.after_idle(self._do_plot)
+        self._pending_plot = plot_args
+
+    def _do_plot(self):
+        plot_args, self._pending_plot = self._pending_plot, None
+        self._plot_widget.plot(*plot_args)
+        self._update_info_text()
+
     def _update_info_text(self):
         cursor_info = self._plot_widget.cursor
         cursor_date = cursor_info.pop('date')
         cursor_extra = '  |  '.join([f'{x}: {y}' for x, y in cursor_info.items()])
-        self._info_text.set('{}  |  '.format(cursor_date) + cursor_extra)
+        info_text = '{}  |  '.format(cursor_date) + cursor_extra
+        if info_text != self._info_text:               # Label is only re-configured on a change
+            self._info_text = info_text
+            self._tk_info.configure(text=info_text)
 
     def on_button1_press(self, event):
         if event.widget == self._plot_widget.tkwidget:
@@ -132,22 +156,30 @@ class guiMain(tk.Tk):
 
     def on_motion(self, event):
         """ Motion Events for ALL Widgets, 'event' provides cursor position in 'Display' Space
-            and is converted to 'Data' Space to update the cursor position.
+            Events are coalesced, the cursor is updated by _flush_motion() at most every 16 msec (~60 Hz)
         """
         if event.widget == self._plot_widget.tkwidget:
-            cursor_xy = self._plot_widget.xform_tk_coords(event.x, event.y)
+            self._pending_motion = (event.x, event.y)
+            if self._motion_after_id is None:
+                self._motion_after_id = self.after(16, self._flush_motion)
 
-            if self._ArgSelFrame.argtype == PLOT_TYPE.SNGLDOY:
-                size_x = self.np_climate_data.shape[0]
-            else:
-                size_x = self.np_climate_data.shape[1]
+    def _flush_motion(self):
+        """ Latest cursor position of on_motion() is converted to 'Data' Space to update the cursor position.
+        """
+        self._motion_after_id = None
+        cursor_xy = self._plot_widget.xform_tk_coords(*self._pending_motion)
 
-            cursor_x = size_x - 1 if cursor_xy[0] >= size_x else cursor_xy[0]
-            cursor_x = 0 if cursor_x < 0 else cursor_x
+        if self._ArgSelFrame.argtype == PLOT_TYPE.SNGLDOY:
+            size_x = self._n_years
+        else:
+            size_x = self._n_days
 
-            # print('motion {} {} {} {:.3f}'.format(self._ArgSelFrame.argtype.name, max_x, *cursor_xy))
-            self._plot_widget.set_cursor(cursor_x)
-            self._update_info_text()
+        cursor_x = size_x - 1 if cursor_xy[0] >= size_x else cursor_xy[0]
+        cursor_x = 0 if cursor_x < 0 else cursor_x
+
+        # print('motion {} {} {} {:.3f}'.format(self._ArgSelFrame.argtype.name, max_x, *cursor_xy))
+        self._plot_widget.set_cursor(cursor_x)
+        self._update_info_text()
 
     def on_TypeButton(self, new_type):
         if self._ArgSelFrame is None:
@@ -178,8 +210,7 @@ class guiMain(tk.Tk):
         # print('  on_TypeButton {} -> {}'.format(argType.name, new_type.name))
 
         argVal = self._ArgSelFrame.argvalue # This May Not Exist
-        self._plot_widget.plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plot_arg)
-        self._update_info_text()
+        self._queue_plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plot_arg)
 
         # except AttributeError:
         #     print('AttributeError {}'.format(new_type.name))
@@ -192,30 +223,26 @@ class guiMain(tk.Tk):
         """
         if argType == PLOT_TYPE.SNGLDOY or argType == PLOT_TYPE.HISTO:
             plot_arg = argVal
-            if plot_arg < 0 or plot_arg >= self.np_climate_data.shape[1]:
+            if plot_arg < 0 or plot_arg >= self._n_days:
                 return False
 
         elif argType == PLOT_TYPE.ALLDOY:
-            try:
-                plot_arg = self.yrList.index(argVal)
-                if plot_arg < 0 or plot_arg >= self.np_climate_data.shape[0]:
-                    return False
-            except ValueError:
+            plot_arg = bisect_left(self.yrList, argVal)      # yrList is sorted
+            if plot_arg >= len(self.yrList) or self.yrList[plot_arg] != argVal:
                 return False
 
-        self._plot_widget.plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plot_arg)
-        self._update_info_text()
+        self._queue_plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plot_arg)
         return True
 
     def on_ArgLimits(self, argType):
         if argType == PLOT_TYPE.SNGLDOY:
-            return 0, self.np_climate_data.shape[1] - 1
+            return 0, self._n_days - 1
 
         elif argType == PLOT_TYPE.ALLDOY:
-            return self.yrList[0], self.yrList[self.np_climate_data.shape[0] - 1]
+            return self.yrList[0], self.yrList[-1]
 
         elif argType == PLOT_TYPE.HISTO:
-            return 0, self.np_climate_data.shape[1] - 1
+            return 0, self._n_days - 1
 
     def on_ObserMenu(self, xItem):
         """ Activated on changes to Observation Menu.
@@ -231,7 +258,7 @@ class guiMain(tk.Tk):
             plotarg = 0
 
         # print('guiMain.on_xItem {} {}'.format(xItem, self._ObserMenu.selectedItem))
-        self._plot_widget.plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plotarg)
+        self._queue_plot(self._TypeButton.enum, self._ObserMenu.selectedItem, plotarg)
 
     def on_StationMenu(self, xItem):
         """ Activated on changes to Station Menu.
@@ -239,7 +266,29 @@ class guiMain(tk.Tk):
         """
         print('guiMain.on_StationMenu {} {}'.format(xItem, self._ObserMenu.selectedItem))
         self._ClimateDataObj.station = xItem
-        self._plot_widget.plot(self._TypeButton.enum, self._ObserMenu.selectedItem, self._ArgSelFrame.argtype)
+        self._queue_plot(self._TypeButton.enum, self._ObserMenu.selectedItem, self._ArgSelFrame.argtype)
+
+    def reload_when_done(self, future, poll_ms=250):
+        """ Polls future (a background Climate Data update) from the Tk event loop, the gui is never blocked.
+            When done, Climate Data is re-read from the DB's & the current plot is redrawn.
+            A failed update is reported, the years it did commit are still reloaded.
+        """
+        if not future.done():
+            self.after(poll_ms, self.reload_when_done, future, poll_ms)
+            return
+
+        error = future.exception()
+        if error is not None:
+            traceback.print_exception(type(error), error, error.__traceback__)
+            messagebox.showerror('Climate Data Update', f'NOAA update failed:\n{type(error).__name__}: {error}',
+                                 parent=self)
+
+        self._ClimateDataObj.reload()
+        self.np_climate_data = self._ClimateDataObj.np_data
+        self._n_years, self._n_days = self.np_climate_data.shape[:2]
+        self.yrList = self._ClimateDataObj.yrList
+        self._plot_widget.reload()
+        self.on_ObserMenu(self._ObserMenu.selectedItem)
 
     def on_configure(self, event):
         """ Track Position of guiMain AND fix incorrect guiMain width changes made by MPL.
@@ -257,6 +306,7 @@ class tkArgSelFrame(ttk.Frame):
     """ A Container (i.e. Frame) Class that changes gui widgets depending on its argType.
 
     """
+    _tkImages_by_root = {}       # Tk root -> arrow icon PhotoImages, read from disk once per root
 
     def __init__(self, parent, argType, callback, callback_lim):
         self._parent = parent
@@ -266,13 +316,16 @@ class tkArgSelFrame(ttk.Frame):
         self._label_text = tk.StringVar()                # Information Widget
         super().__init__(parent, width=100)
 
-        iconDir = path.join(path.dirname(__file__), 'extra')
-        iconPaths = {_name: _path for _name, _path in
-                     zip(['arrow-lf', 'arrow-rt'], [path.join(iconDir, _icon)
-                                                    for _icon in ['arrow-lf16x16.gif', 'arrow-rt16x16.gif']])}
+        tk_root = parent.winfo_toplevel()
+        if tk_root not in tkArgSelFrame._tkImages_by_root:
+            iconDir = path.join(path.dirname(__file__), 'extra')
+            iconPaths = {_name: _path for _name, _path in
+                         zip(['arrow-lf', 'arrow-rt'], [path.join(iconDir, _icon)
+                                                        for _icon in ['arrow-lf16x16.gif', 'arrow-rt16x16.gif']])}
 
-        self._tkImages = {_name: tk.PhotoImage(master=self, file=_file, name=_name)
-                          for _name, _file in iconPaths.items()}
+            tkArgSelFrame._tkImages_by_root[tk_root] = {_name: tk.PhotoImage(master=tk_root, file=_file, name=_name)
+                                                        for _name, _file in iconPaths.items()}
+        self._tkImages = tkArgSelFrame._tkImages_by_root[tk_root]
 
         self._tkPrevBtn = ttk.Button(self, image=self._tkImages['arrow-lf'], width=1, command=self.on_PrevBtn)
         self._tkPrevBtn.grid(row=0, column=2, sticky='nse')
@@ -382,14 +435,13 @@ class tkIntEntry(ttk.Entry):
         super().grid(row = row, column = column, sticky='e')
 
     def isOkay(self, why, text):
-        try:
+        """ Runs on every keystroke, text is always accepted.  Only a complete integer updates value.
+        """
+        if _INT_RE.fullmatch(text):                  # syntax check, no int() exception path per key
             self._value = int(text)
 
             if self._callback:
                 self._callback(self._value)
-        except:
-            # print(f'validate fail {why} {text}')
-            pass
 
         return True
 
@@ -10,9 +10,11 @@ from enum        import IntEnum
 from typing      import Dict, List, Tuple
 from calendar    import month_abbr
 from collections import namedtuple
+from itertools   import accumulate
 from datetime    import date, timedelta
 
 import re
+import math
 import numpy as np
 import tkinter as tk
 import tkinter.ttk as ttk
@@ -20,10 +22,10 @@ import matplotlib as mpl
 import matplotlib.transforms as mpl_xforms
 
 from matplotlib.figure import Figure
-from matplotlib.collections import LineCollection
+from matplotlib.collections import LineCollection, PolyCollection
 from matplotlib.backends.backend_pdf import PdfPages
 from ._mpl_tk import FigureCanvasTk
-from .climate_dataobj import ClimateDataObj, PLOT_DATA
+from .climate_dataobj import ClimateDataObj, PLOT_DATA, dayInt2MMDD, dayInt2Label, date2enum
 
 pltcolor1 = 'dimgray'
 pltcolor2 = 'skyblue'
@@ -36,41 +38,7 @@ mm2days = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
 mmlabels = [month_abbr[x] for x in range(1, 13)]
 PLOT_TYPE = IntEnum('PLOT_TYPE', ['ALLDOY', 'SNGLDOY', 'HISTO'])
 DATE_ENUM = namedtuple('DATE_ENUM',  ['yrenum', 'dayenum'])
-
-def dayInt2Label(day):
-    month_int = 0
-    while day > mm2days[month_int]-1:
-        day -= mm2days[month_int]
-        month_int += 1
-    return f'{mmlabels[month_int]}-{day+1:02d}'
-
-def dayInt2MMDD(day):
-    if day > 365:
-        raise ValueError
-
-    month_int = 0
-    while day > mm2days[month_int]-1:
-        day -= mm2days[month_int]
-        month_int += 1
-    return month_int+1, day+1
-
-def date2enum(dayDate: date | str):
-    dayenum = 0
-    if type(dayDate) == date:
-        yr, mm, dd = dayDate.year, dayDate.month, dayDate.day
-    elif type(dayDate) == str:
-        yr, mm, dd = dayDate.split('-')
-    else:
-        raise ValueError
-
-    for indx in range(12):
-        if mm == 1:
-            break
-        else:
-            mm -= 1
-            dayenum += mm2days[indx]
-    dayenum += dd - 1
-    return dayenum, int(yr)
+_DAYSUM = [0, *accumulate(mm2days)]  # month - 1 -> dayenum of 1st, _DAYSUM[12] = 366
 
 
 class guiPlot(FigureCanvasTk):
@@ -84,8 +52,6 @@ class guiPlot(FigureCanvasTk):
     canvas_dpi = 100
 
     def __init__(self, parent, cdObj, figsize):
-        self._daysum = [sum(mm2days[:x]) for x in range(len(mm2days)+1)]  # Can't be Class Variable!
-
         self._parent = parent
         self._ClimateDataObj = cdObj
 
@@ -120,6 +86,12 @@ class guiPlot(FigureCanvasTk):
         self._ax0twin = None
         self._vertLine = None
         self._markerX = None
+        self._xform = (None, None)    # (key, inverse transData matrix) for xform_tk_coords()
+        self._sngldoy_xaxis = (None, None)  # (yrList, (xtickLocs, xtickLabels, xlim)) for plot_sngldoy()
+        self._cursor_mdy = None       # date of the last cursor query & its text
+        self._cursor_date = ''
+        self._cursor_bg = None        # ax0 pixels without the cursor line, saved on every full draw
+        self.mpl_connect('draw_event', self.on_draw)
 
         mpl.rc('lines',  markersize = 2)
         mpl.rc('ytick',  labelsize  = 8)
@@ -203,7 +175,10 @@ class guiPlot(FigureCanvasTk):
         elif self._type == PLOT_TYPE.HISTO:  # data_x enumerated day
             mdy = dayInt2MMDD(self._dayenum)
 
-        rtnDict = {'date':  '-'.join([str(x) for x in mdy])}
+        if mdy != self._cursor_mdy:                    # date text only rebuilt when the date changes
+            self._cursor_mdy = mdy
+            self._cursor_date = '-'.join([str(x) for x in mdy])
+        rtnDict = {'date': self._cursor_date}
 
         # print('---', self._obs)
 
@@ -235,6 +210,15 @@ class guiPlot(FigureCanvasTk):
 
         return rtnDict
 
+    def reload(self):
+        """ Re-acquire Climate Data references after ClimateDataObj.reload(), a year may have been added
+        """
+        self._station = self._ClimateDataObj.station
+        self._np_climate_data = self._ClimateDataObj.np_data
+        self._yrList = self._ClimateDataObj.yrList
+        self._np_alldoy_mean = self._ClimateDataObj.np_alldoy_mean
+        self._yrenum = min(self._yrenum, self._ClimateDataObj.num_years - 1)
+
     def grid(self, row, column, rowspan, columnspan):
         self._tk_canvas.grid(row=row, column=0, columnspan=columnspan, rowspan=rowspan, sticky='nsew')
 
@@ -257,19 +241,25 @@ class guiPlot(FigureCanvasTk):
             Data Space 0,0 is btm-left corner of plot BUT IS CLIPPED to plot limits
         """
 
-        inv = self._ax0.transData.inverted()
+        # The inverse of transData is cached, recomputed only if axis, limits or axis position change
+        xlimits = self._ax0.get_xlim()
+        ylimits = self._ax0.get_ylim()
+        xform_key = (self._ax0, xlimits, ylimits, self._ax0.bbox.bounds)
+        if self._xform[0] != xform_key:
+            self._xform = (xform_key, self._ax0.transData.inverted().get_matrix())
+        inv = self._xform[1]
+
         canvas_y = self._figure.bbox.height - tk_y
         canvas_x = tk_x
-        xform_coords = inv.transform((canvas_x, canvas_y))
+        xform_coords = (inv[0, 0] * canvas_x + inv[0, 1] * canvas_y + inv[0, 2],
+                        inv[1, 0] * canvas_x + inv[1, 1] * canvas_y + inv[1, 2])
 
-        xlimits = self._ax0.get_xlim()
         data_x = int(
             xlimits[0]) if xform_coords[0] < xlimits[0] \
             else int(xlimits[1]) if xform_coords[0] > xlimits[1] \
             else xform_coords[0] if self._type == PLOT_TYPE.HISTO \
             else round(xform_coords[0])
 
-        ylimits = self._ax0.get_ylim()
         data_y = \
             ylimits[0] if xform_coords[1] < ylimits[0] \
             else ylimits[1] if xform_coords[1] > ylimits[1] \
@@ -286,11 +276,30 @@ class guiPlot(FigureCanvasTk):
         self._markerX = data_x
 
     def set_cursor(self, data_x, data_y=None):
+        """ The cursor line is animated, it is blitted over the saved ax0 background instead of redrawing the figure
+        """
         if self._vertLine is None:
-            self._vertLine = self._ax0.axvline(color='k', linewidth=1, alpha=0.2)  # the vert line
+            self._vertLine = self._ax0.axvline(color='k', linewidth=1, alpha=0.2, animated=True)  # the vert line
 
         self._vertLine.set_xdata(data_x)
-        self._ax0.figure.canvas.draw_idle()
+        if self._cursor_bg is None:   # plot() has not drawn the new figure yet, on_draw() adds the line
+            return
+
+        self.restore_region(self._cursor_bg)
+        self._ax0.draw_artist(self._vertLine)
+        self.blit(self._ax0.bbox)
+
+    def on_draw(self, event):
+        """ Called at the end of every full figure draw, before it is blitted to the tk canvas.
+            Save the ax0 background for set_cursor() then add the (animated) cursor line.
+            Only for draws of this (screen) canvas, savefig() draws with its own canvas & renderer.
+        """
+        if self._ax0 is None or event.canvas is not self:
+            return
+
+        self._cursor_bg = self.copy_from_bbox(self._ax0.bbox)
+        if self._vertLine is not None:
+            self._ax0.draw_artist(self._vertLine)
 
     def plot(self, plotType, arg1=None, arg2=None, arg3=None):
         """ Perform requested plot operation depending on plotType.
@@ -303,6 +312,7 @@ class guiPlot(FigureCanvasTk):
         self._plty.clear()
         self._figure.clear()
         self._vertLine = None
+        self._cursor_bg = None
         # for _child in self._figure.get_children():
         #     self.showArtists(_child, 1)
 
@@ -365,20 +375,24 @@ class guiPlot(FigureCanvasTk):
         """
         self._dayenum = day
 
-        # Configure X-Axis
-        xtendby = 4
-        xlabels = list(range(self._yrList[0] + -xtendby, self._yrList[0])) \
-                  + self._yrList \
-                  + list(range(self._yrList[-1] + 1, self._yrList[-1] + xtendby))
-        xlocs = list(range(-xtendby, len(xlabels) -xtendby))
-        assert len(xlabels) == len(xlocs)
-
-        xtickLocs, xDelta = guiPlot.nice_grid(xlocs[0], xlocs[-1])
-        xtickLabels = [xlabels[xlocs.index(i)] for i in xtickLocs]
-
+        # Configure X-Axis, the ticks only depend on yrList so are computed once per yrList
+        xaxis_key = tuple(self._yrList)
+        if self._sngldoy_xaxis[0] != xaxis_key:
+            xtendby = 4
+            xlabels = list(range(self._yrList[0] + -xtendby, self._yrList[0])) \
+                      + self._yrList \
+                      + list(range(self._yrList[-1] + 1, self._yrList[-1] + xtendby))
+            xlocs = list(range(-xtendby, len(xlabels) -xtendby))
+            assert len(xlabels) == len(xlocs)
+
+            xtickLocs, xDelta = guiPlot.nice_grid(xlocs[0], xlocs[-1], integral=True)
+            xtickLabels = [xlabels[int(i) + xtendby] for i in xtickLocs]   # xlocs[n] == n - xtendby
+            self._sngldoy_xaxis = (xaxis_key, (xtickLocs, xtickLabels, (xlocs[0], xlocs[-1])))
+
+        xtickLocs, xtickLabels, xlim = self._sngldoy_xaxis[1]
         self._ax0.set_xticks(xtickLocs)
         self._ax0.set_xticklabels(xtickLabels)
-        self._ax0.set_xlim(xlocs[0], xlocs[-1])
+        self._ax0.set_xlim(*xlim)
 
         # Get the requested data and its average for the specified day
         obs_name = plt_dtype.name.lower()
@@ -475,21 +489,18 @@ class guiPlot(FigureCanvasTk):
             xorigin_yr = self._yrenum
             xorigin_mm = 0
         originYear = self._yrList[xorigin_yr]
-        self._doy_xorigin = DATE_ENUM(xorigin_yr, self._daysum[xorigin_mm])
+        self._doy_xorigin = DATE_ENUM(xorigin_yr, _DAYSUM[xorigin_mm])
 
         # Configure X-Axis Ticks & Labels Based on xorigin
         #  xorder = a list of enumerated months, starting from doy_xorigin
-        month_1 = self._daysum.index(self._doy_xorigin.dayenum)
+        month_1 = xorigin_mm
         xorder = list(range(month_1, 12)) + list(range(0, month_1))
-        tics = []
-
-        for x in range(1, 13):
-            items = [xorder[y] for y in range(x)]
-            tics.append(sum([mm2days[y] for y in items]))
+        tics = list(accumulate(mm2days[_mm] for _mm in xorder))
 
         xlabels = [mmlabels[x] for x in xorder]
         self._ax0.set_xticks(tics)
         self._ax0.set_xticklabels(xlabels)
+        self._ax0.set_xlim(0, 366)
 
         jan1 = 1.0 - int(self._doy_xorigin.dayenum)/int(self._ClimateDataObj.num_days)
         self._ax0.text(jan1/2, -.1, originYear, transform = self._ax0.transAxes, fontsize = 10)
@@ -508,9 +519,10 @@ class guiPlot(FigureCanvasTk):
         self._plty = self._ClimateDataObj.alldoy_data(plt_dtype, self._doy_xorigin)
 
         if self._plty['dtype'] == PLOT_DATA.RAIN:
-            test = plt_opt['obs']
-            bar = self._ax0.bar(self._plty['obs'][:, 0], self._plty['obs'][:, 1],
-                                color=pltcolor1, label = 'SnglDay', zorder=10)
+            # One PolyCollection of 0.8 day wide bars centered on each day, not a Rectangle patch per day
+            xdays = self._plty['obs'][:, 0]
+            bar = self.add_bars(xdays - 0.4, xdays + 0.4, self._plty['obs'][:, 1],
+                                facecolors=pltcolor1, label = 'SnglDay', zorder=10)
 
             ymax = np.round_(np.max(self._plty['obs'][:, 1]), 1)
             yticks, ydelta = guiPlot.nice_grid(0, ymax)
@@ -556,7 +568,6 @@ class guiPlot(FigureCanvasTk):
         else:
             raise ValueError
 
-        self._ax0.set_xlim(0, 366)
         self._ax0.legend(loc=(0.0, 1.0), labelspacing=.1)
         self._ax0.set_title(f'{self._ClimateDataObj.station}   {title_period} {self._plty["title"]}')
         # self._plty['title]
@@ -581,10 +592,10 @@ class guiPlot(FigureCanvasTk):
         plt_opt['ma']['label'] = f'{self._plty["ma_winsz"]}day-ma'
         plt_opt['obs']['label'] = f'{dayLabel} {self._obs}'
 
-        obsHisto, bins, container = self._ax0.hist(obs_data, **plt_opt['obs'])
-        plt_opt['ma']['bins'] = list(bins)
+        obsHisto, bins = self.hist_bars(obs_data, **plt_opt['obs'])
+        plt_opt['ma']['bins'] = bins
 
-        maHisto, bins, container = self._ax0.hist(ma_data, **plt_opt['ma'])
+        maHisto, bins = self.hist_bars(ma_data, **plt_opt['ma'])
         self._plty['bins'] = bins
         self._plty['binVals'] = {'obs': obsHisto, 'ma': maHisto}
 
@@ -601,85 +612,95 @@ class guiPlot(FigureCanvasTk):
         self._ax0.set_title(ttl)
         self._ax0.legend(loc=(0.0, 1.0))
 
+    def hist_bars(self, data, bins, rwidth, **kwargs):
+        """ Equivalent of ax0.hist(data, bins, rwidth=rwidth, **kwargs) but all bars are a single PolyCollection,
+            not a Rectangle patch per bin.  Returns (counts, bins)
+        """
+        counts, bins = np.histogram(data, bins=bins)
+        bin_width = np.mean(np.diff(bins))
+        x0 = bins[:-1] + 0.5 * (1.0 - rwidth) * bin_width     # bars centered in their bin, like ax.hist
+        self.add_bars(x0, x0 + rwidth * bin_width, counts, **kwargs)
+        self._ax0.autoscale_view()
+        return counts, bins
+
+    def add_bars(self, x0, x1, heights, **kwargs):
+        """ Adds bars from x0 to x1 (data units, so they scale with the axes) and 0 to heights to ax0
+            as a single PolyCollection, not a Rectangle patch per bar.  Returns the PolyCollection
+        """
+        x0 = np.asarray(x0, dtype=float)
+        x1 = np.asarray(x1, dtype=float)
+        heights = np.asarray(heights, dtype=float)
+        y0 = np.zeros_like(heights)
+        verts = np.stack((np.stack((x0, y0), axis=1), np.stack((x0, heights), axis=1),
+                          np.stack((x1, heights), axis=1), np.stack((x1, y0), axis=1)), axis=1)
+
+        bars = PolyCollection(verts, linewidths=0, **kwargs)
+        bars.sticky_edges.y.append(0)
+        self._ax0.add_collection(bars)
+        return bars
+
     def write_pdf(self, fname):
-        pdfObj = PdfPages(fname)
-        pdfObj.savefig(self._figure)
-        pdfObj.close()
+        # The animated cursor line is skipped by a normal draw, make it a regular artist for the pdf
+        if self._vertLine is not None:
+            self._vertLine.set_animated(False)
+        try:
+            pdfObj = PdfPages(fname)
+            pdfObj.savefig(self._figure)
+            pdfObj.close()
+        finally:
+            if self._vertLine is not None:
+                self._vertLine.set_animated(True)
         print('write pdf')
 
     @staticmethod
     def nice_scale(value):
-        """ Return scale factor such that: 1.0 <= value * scale < 10.0
+        """ Return scale factor such that: 1.0 <= abs(value) * scale < 10.0
+            A value of 0, nan or inf has no decade, 1.0 is returned
         """
-        scale = 1.0
-        for loop_count in range(6):
-            factor = scale * value
-            if factor >= 1.0 and factor < 10.0:
-                break
-
-            elif factor < 1.0:
-                scale *= 10.0
-
-            else:
-                scale *= 0.1
-
-        if loop_count > 5:
-            raise ValueError
-
-        return scale
+        if value == 0 or not math.isfinite(value):
+            return 1.0
+        return 10.0 ** -math.floor(math.log10(abs(value)))
 
     @staticmethod
-    def nice_grid(mintick: int, maxtick):
+    def nice_grid(mintick: int, maxtick, integral=False):
         """ Calculate a nice grid spacing for the interval [mintick .. maxtick]
             Returns a list of equally spaced ints in the specified range.
             List always begins @ mintick but last value depends on grid spacing.
 
-            Use the eqn: num_grid * grid_space = range
-              grid_space = range / num_grid  : for min(num_grid) to max(num_grid)
-
-            VERY UGLY - THERE MUST BE A BETTER ALGORITHM!
+            The range is scaled by a power of 2 into [min_grid .. max(good_mod) * max_grid], then grid_space is the
+            1st good_mod that equals round(range * scale / num_grid) for some num_grid in [min_grid .. max_grid].
+            Only the num_grid nearest range * scale / good_mod can match, so no list of candidates is searched.
+            integral = True (e.g. an axis of years) never returns a grid_space < 1.
         """
-        min_grid = 8.0
-        max_grid = 25.0
-        rng = maxtick - mintick
-
-        scale = 1.0
-        grid_range = range(int(min_grid), int(max_grid+1))
-        rng = (maxtick - mintick)
-        # print('nice_grid {} {} {} {}'.format(mintick, maxtick, rng, scale))
-
+        min_grid = 8
+        max_grid = 25
         good_mod = [5, 2, 1]
-        for loop_count in range(6):
-            pts_list = [rng * scale/x for x in grid_range]
-            # print(','.join('{:.2f}'.format(x) for x in pts_list))
-
-            if min(pts_list) > max(good_mod):    # too many grid lines, need bigger spacing
-                scale *= 0.5
-                # print('smaller', scale)
-                continue
-
-            elif max(pts_list) < min(good_mod):  # not enough grid lines, need smaller spacing
-                scale *= 2.0
-                # print('bigger',scale)
-                continue
-
-            grid_spacing = [int(round(x)) for x in pts_list]
-            for _mod in good_mod:
-                # print(_mod, good_mod)
-
-                if _mod in grid_spacing:
-                    grid_space = _mod / scale
-                    break
-                else:
-                    grid_space = None
-
-            # print('Loop End {} {} {}'.format(grid_space, mintick, maxtick))
-
-            if grid_space:
-                ticks_found = np.arange(mintick, maxtick, grid_space)
-                # print('nice_grid {}'.format(ticks_found))
+        rng = maxtick - mintick
+        if not rng > 0:
+            raise RuntimeError(f'guiPlot.nice_grid {mintick} {maxtick}')
+
+        # scale = 2**N, the smallest |N| that brings rng * scale into [min_grid .. max(good_mod) * max_grid]
+        if rng > max(good_mod) * max_grid:
+            scale = 2.0 ** -math.ceil(math.log2(rng / (max(good_mod) * max_grid)))
+        elif rng < min_grid:
+            scale = 2.0 ** math.ceil(math.log2(min_grid / rng))
+        else:
+            scale = 1.0
+        scaled_rng = rng * scale
+
+        for _mod in good_mod:
+            num_grid = scaled_rng / _mod
+            nearest = {min(max(math.floor(num_grid), min_grid), max_grid),
+                       min(max(math.ceil(num_grid), min_grid), max_grid)}
+            if any(round(scaled_rng / _n) == _mod for _n in nearest):
+                grid_space = _mod / scale
+                break
+        else:
+            raise RuntimeError(f'guiPlot.nice_grid {mintick} {maxtick}')
 
-                return list(ticks_found), grid_space
+        if integral and grid_space < 1:
+            grid_space = 1.0
 
-        raise RuntimeError('guiPlot.nice_grid {}'.format(scale))
+        ticks_found = np.arange(mintick, maxtick, grid_space)
+        return list(ticks_found), grid_space
 
@@ -7,6 +7,8 @@ Two data types are central to accessing Climate Data:
 import os
 import re
 import copy
+import time
+import threading
 import requests
 import numpy as np
 
@@ -14,6 +16,8 @@ from glob import glob
 from datetime import date, datetime
 from collections import namedtuple
 from haversine import haversine, Unit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .db_coupler import DBTYPE_CDO
 from typing import Dict, List, Tuple
 
@@ -22,6 +26,8 @@ STATION_T = namedtuple('STATION_T',  ['id', 'name', 'lat_long', 'elev', 'mindate
 CDFLDS_NODATE = [x for x in DBTYPE_CDO._fields if x != 'date']   # field names of Climate Data Only, No Date
 CD_NODATE_NPDT = np.dtype([(_key, np.float32) for _key in CDFLDS_NODATE])
 DEFAULT_END_POINT = 'www.ncei.noaa.gov'
+MAX_DOWNLOADS = 5        # Max concurrent get_dataset_v1 requests
+MAX_REQUESTS_PER_SEC = 5 # NOAA allows 5 requests / second, more are answered with 429
 
 class NOAA():
     """ NOAA Daily Summary Climate Data Access
@@ -38,12 +44,35 @@ class NOAA():
         self._date_last = date.today() if cfgDict['date_last'] == 'now' \
             else date.fromisoformat(cfgDict['date_last'])
 
+        # A single Session for all requests, connections are pooled & kept alive between requests
+        self._session = requests.Session()
+        self._session.headers.update({'token': self._cdo_token, 'Connection': 'keep-alive'})
+        # Busy (429/5xx) responses & connect errors are retried, a read timeout is not: it raises ReadTimeout
+        retry = Retry(total=3, read=False, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)
+        self._session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry))
+
+        # All threads share the request rate, see _get()
+        self._throttle_lock = threading.Lock()
+        self._next_request = 0.0
+
         if cfgDict['home'] is None:
             self.home_coords = None
         else:
             homeCoords = cfgDict['home'].strip('()').split(',') if cfgDict['home'] is not None else None
             self.home_coords = [float(x) for x in homeCoords]
 
+    def _get(self, url, **kwargs) -> requests.Response:
+        """ self._session.get() with the start of requests spaced 1 / MAX_REQUESTS_PER_SEC apart, from any thread
+        """
+        with self._throttle_lock:
+            now = time.monotonic()
+            wait = self._next_request - now
+            self._next_request = max(now, self._next_request) + 1.0 / MAX_REQUESTS_PER_SEC
+        if wait > 0:
+            time.sleep(wait)
+        return self._session.get(url, **kwargs)
+
     @property
     def home(self):
         _home = 'None' if self.home_coords is None \
@@ -55,14 +84,13 @@ class NOAA():
         return self._findrgn
 
     def station_info(self, station_id):
-        header = {'token': self._cdo_token}
         uri = 'cdo-web/api/v2/{}/{}'.format('stations', station_id)
         station = None
         errStatus = None
 
         try:
-            res = requests.get('https://{}/{}'.format(DEFAULT_END_POINT, uri), headers=header)
-        except requests.exceptions.ReadTimeout as err:
+            res = self._get('https://{}/{}'.format(DEFAULT_END_POINT, uri))
+        except requests.exceptions.RequestException as err:
             errStatus = err.args[0]
             res = None
 
@@ -104,7 +132,6 @@ class NOAA():
         # home_lat_long = [float(x) for x in home_coords.split(',')]
 
         results = []
-        header = {'token': self._cdo_token}
         uri = 'cdo-web/api/v2/{}?locationid={}&limit=1000'.format('stations',
                                                                   f'FIPS:{self.findrgn}')
         offset = 0
@@ -113,9 +140,9 @@ class NOAA():
         date_filter_max = date.today().year
         while not done:
             try:
-                res = requests.get('https://{}/{}'.format(DEFAULT_END_POINT, uri),
-                                   headers=header, timeout=(2.0, 2.0))
-            except requests.exceptions.ReadTimeout as err:
+                res = self._get('https://{}/{}'.format(DEFAULT_END_POINT, uri),
+                                        timeout=(2.0, 2.0))
+            except requests.exceptions.RequestException as err:
                 errStatus = err.args[0]
                 break
 
@@ -188,8 +215,7 @@ class NOAA():
                        'endDate'  : date(start.year, 12, 31).isoformat(),
                        'units' : 'standard'}
             try:
-                res = requests.get(noaa_url, params=payload, timeout=(5.0, 5.0),
-                                   headers={"Token": self._cdo_token})
+                res = self._get(noaa_url, params=payload, timeout=(5.0, 5.0))
             except Exception as err:
                 print('Err {}'.format(err))
                 break
@@ -261,7 +287,7 @@ class NOAA():
                 #            'limit' : limit_count}
 
 
-                res = requests.get(noaa_url, params = payload, headers = {"Token": CDO_TOKEN})
+                res = self._get(noaa_url, params = payload, headers = {"Token": CDO_TOKEN})
 
 
 
@@ -0,0 +1,38 @@
+""" guiPlot.nice_grid must keep the grid spacing & tick counts of the original search algorithm.
+"""
+import pytest
+import numpy as np
+
+from climate_analyzer.gui_plot import guiPlot
+
+# rng -> (grid_space, num ticks) of nice_grid(0, rng) before the closed-form rewrite
+BASELINE = {1: (0.125, 8), 2: (0.25, 8), 3: (0.5, 6), 4: (0.5, 8), 5: (0.5, 10),
+            6: (1.0, 6), 7: (1.0, 7), 8: (1.0, 8), 9: (1.0, 9), 10: (1.0, 10),
+            11: (1.0, 11), 12: (2.0, 6), 13: (2.0, 7), 14: (2.0, 7), 15: (2.0, 8),
+            16: (2.0, 8), 17: (2.0, 9), 18: (2.0, 9), 19: (2.0, 10), 20: (2.0, 10),
+            21: (2.0, 11), 22: (2.0, 11), 23: (2.0, 12), 24: (2.0, 12), 25: (2.0, 13),
+            26: (2.0, 13), 27: (2.0, 14), 28: (2.0, 14), 29: (2.0, 15), 30: (2.0, 15)}
+
+
+@pytest.mark.parametrize('rng', sorted(BASELINE))
+def test_matches_baseline(rng):
+    ticks, grid_space = guiPlot.nice_grid(0, rng)
+    assert (grid_space, len(ticks)) == BASELINE[rng]
+
+
+@pytest.mark.parametrize('rng', sorted(BASELINE))
+def test_integral_axis(rng):
+    """ An axis of years never gets a fractional grid_space, otherwise year labels repeat
+    """
+    ticks, grid_space = guiPlot.nice_grid(-4, rng - 4, integral=True)
+    base_space, base_num = BASELINE[rng]
+
+    assert grid_space >= 1
+    assert np.array_equal(ticks, np.round(ticks))
+    if base_space >= 1:
+        assert (grid_space, len(ticks)) == (base_space, base_num)
+
+
+def test_empty_range():
+    with pytest.raises(RuntimeError):
+        guiPlot.nice_grid(5, 5)